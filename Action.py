@@ -1,6 +1,50 @@
 from Setup import *
 from Preflop import *
 from Postflop import *
+from array import array
+
+
+def seat_position(seat, num_players):
+    """Returns the relative position (small/big/early/middle/late) of a seat number, or None if it has none
+
+    Args:
+        seat (int): Seat number, using the small blind as 1 and incrementing by 1 after each player
+        num_players (int): Number of players at the table
+    """
+    position = None
+    if seat == 1:
+        position = 'small'
+    if seat == 2:
+        position = 'big'
+    if num_players == 9:
+        if seat == 3 or seat == 4:
+            position = 'early'
+        if 5 <= seat <= 7:
+            position = 'middle'
+        if seat == 8 or seat == 9:
+            position = 'late'
+    if num_players == 8:
+        if seat == 3 or seat == 4:
+            position = 'early'
+        if seat == 5 or seat == 6:
+            position = 'middle'
+        if seat == 7 or seat == 8:
+            position = 'late'
+    if num_players == 6 or num_players == 7:
+        if seat == 3:
+            position = 'early'
+        if seat == 4 or seat == 5:
+            position = 'middle'
+        if seat == 6 or seat == 7:
+            position = 'late'
+    if num_players == 4 or num_players == 5:
+        if seat == 3:
+            position = 'early'
+        if seat == 4:
+            position = 'middle'
+        if seat == 5:
+            position = 'late'
+    return position
 
 
 class Action:
@@ -8,7 +52,8 @@ class Action:
     Utilizes information from the table and previous actions
 
     Args:
-        card_list (list): A list containing the hand dealt along with the cards on the board
+        card_list (list): A list containing the hand dealt along with the cards on the board. Cards may be
+            integers, Card objects or two-character strings
         position (int): Seat number, using the small blind as 1 and incrementing by 1 after each player
         num_players (int): Number of players at the table
         stack (int): Chip count
@@ -16,11 +61,14 @@ class Action:
         big_blind (float): Value of big blind
         pot (int): Total chips in the pot
         action (Log): An instance of the Log class
+        profile (Profile): Preflop strategy profile, using the built-in Preflop rules if None
+        postflop (Postflop): The Postflop kept for this hand since the flop, built from card_list if None
     """
 
-    def __init__(self, card_list, position, num_players, stack, small_blind, big_blind, pot, action):
-        self.card_list = card_list
-        self.hand_dealt = card_list[0:2]
+    def __init__(self, card_list, position, num_players, stack, small_blind, big_blind, pot, action, profile=None,
+                 postflop=None):
+        self.card_list = to_ints(card_list)
+        self.hand_dealt = self.card_list[0:2]
         self.position = position
         self.num_players = num_players
         self.stack = stack
@@ -28,6 +76,8 @@ class Action:
         self.big_blind = big_blind
         self.pot = pot
         self.action = action
+        self.profile = profile
+        self.postflop = postflop
 
     def stage(self):
         if len(self.card_list) == 2:
@@ -47,62 +97,58 @@ class Action:
         denominator = self.current_bet() - self.action.log[player]['Bet']
         return numerator / denominator
 
+    def drawing_odds(self):
+        """Returns the odds against hitting an out on the next card, e.g. 4.9 for eight outs on the flop"""
+        outs = Draw(self.card_list).num_outs()
+        if outs == 0:
+            return float('inf')
+        return (52 - len(self.card_list) - outs) / outs
+
+    def texture(self):
+        """Returns the precomputed features of the flop (pairing, suits, connectedness, nut hand) from the flop index"""
+        return self.assessment().texture()
+
+    def assessment(self):
+        """Returns the Postflop for the current cards, which carries its street analysis from one street to the next"""
+        if self.postflop is None:
+            self.postflop = Postflop(self.card_list)
+        return self.postflop
+
     def num_raises(self):
-        """Determines the number of raises that have transpired
+        """Determines the number of raises that have transpired on this street
 
         Returns:
             An integer value (e.g. 1 if only one raise has occurred, 2 if a three-bet occurred, etc.)
         """
-        return len(self.action.all_raises)
+        return self.action.num_raises()
 
     def num_players_in_hand(self):
         """Determines the number of players in the hand"""
-        num_players = 0
-        for player in self.action.log:
-            if self.action.log[player]['In hand']:
-                num_players += 1
-        return num_players
+        return self.action.num_in_hand
 
     def num_players_behind(self):
         """Determines the number of players still waiting their turn after you"""
-        num_players = 0
-        for player in self.action.log:
-            if self.action.log[player]['Waiting']:
-                num_players += 1
-        return num_players
+        return self.action.num_waiting
 
     def num_callers(self):
         """Determines the number of players in the hand that have called a bet or raise"""
-        callers = 0
-        for player in self.action.log:
-            if self.action.log[player]['Bet'] == self.current_bet():
-                callers += 1
-        return callers - 1
+        return self.action.num_callers()
 
     def current_bet(self):
         """Returns the previous bet if one exists"""
-        ind_bets = []
-        for player in self.action.log:
-            ind_bets.append(self.action.log[player]['Current bet'])
-        return max(ind_bets)
+        return self.action.current_bet()
 
     def aggressor(self, preflop=False, flop=False, turn=False):
-        """Returns the preflop aggressor"""
+        """Returns the last player to bet or raise on the given street"""
         if preflop:
-            for player in self.action.log:
-                if "Preflop aggressor" in self.log[player]["Notes"]:
-                    return player
+            return self.action.aggressors.get("Preflop")
         if flop:
-            for player in self.action.log:
-                if "Flop aggressor" in self.log[player]["Notes"]:
-                    return player
+            return self.action.aggressors.get("Flop")
         if turn:
-            for player in self.action.log:
-                if "Flop aggressor" in self.log[player]["Notes"]:
-                    return player
+            return self.action.aggressors.get("Turn")
         return None
 
-    def bet_sizing(self, value=False, semi_bluff=False):
+    def bet_sizing(self, value=False, semi_bluff=False, c_bet=False):
         if value:
             frequency = random.uniform(0, 1)
             if frequency >= 0.5:
@@ -119,6 +165,8 @@ class Action:
                 return 0.75 * self.pot
             else:
                 return 0
+        if c_bet:
+            return 0.33 * self.pot
         return
 
     def check_raise_sizing(self, value=False, semi_bluff=False):
@@ -149,6 +197,22 @@ class Action:
         if self.stage() == "River":
             return self.position > self.aggressor(turn=True)
 
+    def rules(self):
+        """Returns the compiled preflop rules of the profile, or None for the built-in rules"""
+        return self.profile.rules if self.profile is not None else None
+
+    def suggest(self):
+        """Suggests an action for the current street, or None if there is no suggestion"""
+        stage = self.stage()
+        if stage == "Preflop":
+            return self.preflop_action()
+        if stage == "Flop":
+            return self.flop_action()
+        if stage == "Turn":
+            return self.turn_action()
+        if stage == "River":
+            return self.river_action()
+
     def preflop_action(self):
         """Suggests a preflop action
 
@@ -156,52 +220,20 @@ class Action:
             One of the following strings - call, check, raise, or fold
         """
         # Uses the position number to determine the relative position (small/big/early/middle/late)
-        position = None
-        if self.position == 1:
-            position = 'small'
-        if self.position == 2:
-            position = 'big'
-        if self.num_players == 9:
-            if self.position == 3 or self.position == 4:
-                position = 'early'
-            if 5 <= self.position <= 7:
-                position = 'middle'
-            if self.position == 8 or self.position == 9:
-                position = 'late'
-        if self.num_players == 8:
-            if self.position == 3 or self.position == 4:
-                position = 'early'
-            if self.position == 5 or self.position == 6:
-                position = 'middle'
-            if self.position == 7 or self.position == 8:
-                position = 'late'
-        if self.num_players == 6 or self.num_players == 7:
-            if self.position == 3:
-                position = 'early'
-            if self.position == 4 or self.position == 5:
-                position = 'middle'
-            if self.position == 6 or self.position == 7:
-                position = 'late'
-        if self.num_players == 4 or self.position == 5:
-            if self.position == 3:
-                position = 'early'
-            if self.position == 4:
-                position = 'middle'
-            if self.position == 5:
-                position = 'late'
+        position = seat_position(self.position, self.num_players)
         if self.num_players <= 3:
             return "Sit out"
 
         # Returns suggested action by the number of previous raises
         if self.num_raises() == 0:
-            preflop_assessment = Preflop(self.hand_dealt[0], self.hand_dealt[1], position)
+            preflop_assessment = Preflop(self.hand_dealt[0], self.hand_dealt[1], position, self.rules())
             if preflop_assessment.playable():
                 return "Raise " + str((3 * self.current_bet()) + self.num_callers() * self.big_blind)
             else:
                 return "Fold"
 
         if self.num_raises() == 1:
-            preflop_assessment = Preflop(self.hand_dealt[0], self.hand_dealt[1], position)
+            preflop_assessment = Preflop(self.hand_dealt[0], self.hand_dealt[1], position, self.rules())
             suggested_action = preflop_assessment.facing_raise()
             if suggested_action == 0:
                 return "Fold"
@@ -221,7 +253,7 @@ class Action:
                 return "Raise " + str((3 * self.current_bet()) + self.num_callers() * self.big_blind)
 
         if self.num_raises() == 2:
-            preflop_assessment = Preflop(self.hand_dealt[0], self.hand_dealt[1], position)
+            preflop_assessment = Preflop(self.hand_dealt[0], self.hand_dealt[1], position, self.rules())
             suggested_action = preflop_assessment.facing_three_bet()
             if suggested_action == 0:
                 return "Fold"
@@ -231,7 +263,7 @@ class Action:
                 return "Raise " + str((3 * self.current_bet()) + self.num_callers() * self.big_blind * 3)
 
         if self.num_raises() >= 3:
-            preflop_assessment = Preflop(self.hand_dealt[0], self.hand_dealt[1], position)
+            preflop_assessment = Preflop(self.hand_dealt[0], self.hand_dealt[1], position, self.rules())
             suggested_action = preflop_assessment.facing_four_bet()
             if suggested_action == 0:
                 return "Fold"
@@ -241,8 +273,7 @@ class Action:
                 return "Call or five-bet"
 
     def flop_action(self):
-        flop_assessment = Postflop(self.card_list)
-        suggested_action = flop_assessment.flop_scenario()
+        suggested_action = self.assessment().flop_scenario()
 
         # Committed to the pot
         if self.spr() <= 3:
@@ -262,9 +293,12 @@ class Action:
                 # C-bet as a semi-bluff
                 elif 3 <= suggested_action < 4:
                     return "Bet " + str(self.bet_sizing(semi_bluff=True))
-                # C-bet with range advantage (bluff)
+                # C-bet with range advantage (bluff) on dry flops: paired, or unconnected and not monotone
                 elif 0 <= suggested_action < 2:
-                    return "Bet " + str(self.bet_sizing(c_bet=True))
+                    texture = self.texture()
+                    if texture['pairing'] or (texture['connectedness'] <= 2 and texture['suits'] > 1):
+                        return "Bet " + str(self.bet_sizing(c_bet=True))
+                    return "Check"
                 # Check with showdown value
                 elif 4 <= suggested_action < 5:
                     return "Check"
@@ -321,7 +355,7 @@ class Action:
                 if suggested_action >= 5:
                     return "Call"
                 elif 3 <= suggested_action < 4:
-                    if self.pot_odds() >= 0.35:
+                    if self.pot_odds(self.position) >= 0.35:
                         return "Call"
 
                 else:
@@ -341,12 +375,12 @@ class Action:
                     if suggested_action == 3.5:
                         return "Call"
                     if suggested_action == 3.4 or suggested_action == 3.3:
-                        if self.pot_odds(self.position) >= 5:
+                        if self.pot_odds(self.position) >= self.drawing_odds():
                             return "Call"
                         else:
                             return "Fold"
                     if suggested_action == 3.1 or suggested_action == 3.2:
-                        if self.pot_odds(self.position) >= 11:
+                        if self.pot_odds(self.position) >= self.drawing_odds():
                             return "Call"
                         else:
                             return "Fold"
@@ -367,12 +401,12 @@ class Action:
                     if suggested_action == 3.5:
                         return "Call"
                     if suggested_action == 3.4 or suggested_action == 3.3:
-                        if self.pot_odds(self.position) >= 5:
+                        if self.pot_odds(self.position) >= self.drawing_odds():
                             return "Call"
                         else:
                             return "Fold"
                     if suggested_action == 3.1 or suggested_action == 3.2:
-                        if self.pot_odds(self.position) >= 11:
+                        if self.pot_odds(self.position) >= self.drawing_odds():
                             return "Call"
                         else:
                             return "Fold"
@@ -390,118 +424,359 @@ class Action:
                 return "Check"
 
     def turn_action(self):
-        return
+        suggested_action = self.assessment().good_turn()
+
+        # When action checks to you
+        if self.current_bet() == 0:
+            # Bet two pair or better for value
+            if suggested_action == 4:
+                return "Bet " + str(self.bet_sizing(value=True))
+            # Keep up the pressure with top pair or a flush draw as the flop aggressor
+            elif suggested_action == 3 and self.aggressor(flop=True) == self.position:
+                return "Bet " + str(self.bet_sizing(semi_bluff=True))
+            else:
+                return "Check"
+
+        # When facing a bet or raise
+        if suggested_action == 4:
+            return "Call"
+        # Call with a draw or a pair when the price is right
+        elif suggested_action >= 2 and self.pot_odds(self.position) >= self.drawing_odds():
+            return "Call"
+        else:
+            return "Fold"
 
     def river_action(self):
-        return
+        suggested_action = self.assessment().good_river()
+
+        # When action checks to you
+        if self.current_bet() == 0:
+            if suggested_action == 4:
+                return "Bet " + str(self.bet_sizing(value=True))
+            else:
+                return "Check"
+
+        # When facing a bet or raise
+        if suggested_action == 4:
+            return "Call"
+        else:
+            return "Fold"
+
+
+# Columns of Log and StreetLog, and the dict-style key that reads each one
+log_columns = ['actions', 'bets', 'waiting', 'in_hand', 'current_bets', 'stacks', 'notes', 'total_raises']
+log_keys = {"Action": 'actions', "Bet": 'bets', "Waiting": 'waiting', "In hand": 'in_hand',
+            "Current bet": 'current_bets', "Stack": 'stacks', "Notes": 'notes', "Total raises": 'total_raises'}
+_flag_columns = {'waiting', 'in_hand'}
+
+
+class PlayerView:
+    """Dict-style access to one player's entries in a Log or StreetLog, e.g. view["Bet"]
+
+    Writes go through the Log so that its aggregates stay correct. Views of a StreetLog are read-only.
+    """
+
+    __slots__ = ('source', 'index')
+
+    def __init__(self, source, index):
+        self.source = source
+        self.index = index
+
+    def __getitem__(self, key):
+        column = log_keys[key]
+        value = getattr(self.source, column)[self.index]
+        return bool(value) if column in _flag_columns else value
+
+    def __setitem__(self, key, value):
+        if not isinstance(self.source, Log):
+            raise TypeError('Street logs are read-only')
+        self.source.set(self.index + 1, key, value)
+
+    def __iter__(self):
+        return iter(log_keys)
+
+    def __contains__(self, key):
+        return key in log_keys
+
+    def keys(self):
+        return log_keys.keys()
+
+    def items(self):
+        return [(key, self[key]) for key in log_keys]
+
+    def get(self, key, default=None):
+        return self[key] if key in log_keys else default
+
+    def copy(self):
+        """Returns the entries as a plain dictionary, copying the notes"""
+        entries = dict(self.items())
+        entries["Notes"] = list(entries["Notes"])
+        return entries
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class SeatView:
+    """Dict-style access to the seated players of a Log or StreetLog, keyed by position"""
+
+    __slots__ = ('source',)
+
+    def __init__(self, source):
+        self.source = source
+
+    def __getitem__(self, position):
+        if not 1 <= position <= len(self.source.seated) or not self.source.seated[position - 1]:
+            raise KeyError(position)
+        return PlayerView(self.source, position - 1)
+
+    def __iter__(self):
+        return (index + 1 for index, seated in enumerate(self.source.seated) if seated)
+
+    def __len__(self):
+        return sum(self.source.seated)
+
+    def __contains__(self, position):
+        return 1 <= position <= len(self.source.seated) and bool(self.source.seated[position - 1])
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[position] for position in self]
+
+    def items(self):
+        return [(position, self[position]) for position in self]
+
+    def copy(self):
+        """Returns a detached dictionary of dictionaries that later changes to the log do not affect"""
+        return {position: self[position].copy() for position in self}
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+class StreetLog:
+    """An immutable copy of a Log taken at the end of a street
+
+    Args:
+        log (Log): The log to copy
+
+    Attributes:
+        log (SeatView): Dict-style access to the copied entries, as with Log.log
+    """
+
+    __slots__ = tuple(log_columns) + ('seated', 'log')
+
+    def __init__(self, log):
+        for column in log_columns:
+            setattr(self, column, tuple(getattr(log, column)))
+        self.notes = tuple(tuple(notes) for notes in log.notes)
+        self.seated = tuple(log.seated)
+        self.log = SeatView(self)
+
+    def __getitem__(self, position):
+        return self.log[position]
+
+    def __iter__(self):
+        return iter(self.log)
+
+    def __len__(self):
+        return len(self.log)
 
 
 class Log:
     """Keeps track of actions at the table
 
+    Entries are kept in one column per field, indexed by position - 1, and table-wide aggregates are updated as
+    entries change, so reading them never scans the log.
+
     Args:
         num_players (int): The number of players at the table
 
     Attributes:
-        log (dict): A dictionary of dictionaries representing all previous players' actions. Keys are position
-            numbers on the table, while each inner dictionary contains information from that player.
+        log (SeatView): Dict-style access to every seated player's entries. Keys are position numbers on the table,
+            while each inner view has the keys "Action", "Bet", "Waiting", "In hand", "Current bet", "Stack",
+            "Notes" and "Total raises". Assigning through it updates the columns and aggregates.
+        preflop_log (StreetLog): The log as it was at the end of preflop action, or None
+        flop_log (StreetLog): The log as it was at the end of flop action, or None
+        turn_log (StreetLog): The log as it was at the end of turn action, or None
+        highest_bet (float): The largest current bet on this street
+        num_in_hand (int): Players still in the hand
+        num_waiting (int): Players still waiting to act
+        bet_counts (Counter): Number of players who have put in each amount on this street
+        raises (int): Number of raises on this street
+        last_aggressor (int): Position of the last player to bet or raise, or None
+        aggressors (dict): Position of the last player to bet or raise on each street, keyed by "Preflop", "Flop"
+            and "Turn"
     """
 
+    __slots__ = tuple(log_columns) + ('seated', 'log', 'num_players', 'all_raises', 'preflop_log', 'flop_log',
+                                      'turn_log', 'highest_bet', 'num_in_hand', 'num_waiting', 'bet_counts',
+                                      'raises', 'last_aggressor', 'aggressors')
+
     def __init__(self, num_players):
         self.num_players = num_players
-        self.log = {}
-        for i in range(1, num_players + 1):
-            self.log[i] = {"Action": None, "Bet": 0, "Waiting": True, "In hand": True,
-                           "Current bet": 0, "Stack": None, "Notes": []}
+        self.actions = [None] * num_players
+        self.bets = array('d', [0] * num_players)
+        self.waiting = array('b', [1] * num_players)
+        self.in_hand = array('b', [1] * num_players)
+        self.current_bets = array('d', [0] * num_players)
+        self.stacks = array('d', [0] * num_players)
+        self.notes = [[] for i in range(num_players)]
+        self.total_raises = [0] * num_players
+        self.seated = array('b', [1] * num_players)
+        self.log = SeatView(self)
         self.all_raises = []
         self.preflop_log = None
         self.flop_log = None
         self.turn_log = None
+        self.highest_bet = 0
+        self.num_in_hand = num_players
+        self.num_waiting = num_players
+        self.bet_counts = collections.Counter({0: num_players})
+        self.raises = 0
+        self.last_aggressor = None
+        self.aggressors = {}
 
     def add(self, position, action=None, bet=None, waiting=None, in_hand=None, current_bet=None,
-            note=None):
+            note=None, stack=None):
+        index = position - 1
         if action is not None:
-            self.log[position]["Action"] = action
+            self.actions[index] = action
+        if stack is not None:
+            self.stacks[index] = stack
+        elif bet is not None:
+            # The bet is the player's total on this street, so only the difference comes out of their stack
+            self.stacks[index] -= bet - self.bets[index]
         if bet is not None:
-            previous_bet = self.log[position]["Bet"]
-            if action == "CALL" and previous_bet != 0:
-                difference = bet - previous_bet
-                self.log[position]["Stack"] -= difference
-            elif action == "RAISE" and previous_bet != 0:
-                difference = bet - previous_bet
-                self.log[position]["Stack"] -= difference
-            elif action == "ALL IN":
-                if previous_bet != 0:
-                    difference = bet - previous_bet
-                    self.log[position]["Stack"] -= difference
-                else:
-                    self.log[position]["Stack"] -= bet
-            else:
-                self.log[position]["Stack"] -= bet
-            if self.current_bet() < bet:
-                if self.preflop_log is None:
-                    self.log[position]["Notes"].append("Preflop aggressor")
-                    self.clear_aggressors(position)
-                elif self.flop_log is None:
-                    self.log[position]["Notes"].append("Flop aggressor")
-                    self.clear_aggressors(position)
-                elif self.turn_log is None:
-                    self.log[position]["Notes"].append("Turn aggressor")
+            if self.highest_bet < bet:
+                street = self.street()
+                if street != "River":
+                    self.notes[index].append(street + " aggressor")
                     self.clear_aggressors(position)
-            self.log[position]["Bet"] = bet
+                    self.aggressors[street] = position
+                self.last_aggressor = position
+            self._set_bet(index, bet)
         if waiting is not None:
-            self.log[position]['Waiting'] = waiting
+            self._set_waiting(index, waiting)
         if in_hand is not None:
-            self.log[position]['In hand'] = in_hand
+            self._set_in_hand(index, in_hand)
         if current_bet is not None:
-            self.log[position]["Current bet"] = current_bet
+            self._set_current_bet(index, current_bet)
         if note is not None:
-            self.log[position]["Notes"].append(note)
+            self.notes[index].append(note)
+
+    def set(self, position, key, value):
+        """Sets one entry by its dict-style key, as in log.log[position][key] = value"""
+        index = position - 1
+        column = log_keys[key]
+        if column == 'bets':
+            self._set_bet(index, value)
+        elif column == 'waiting':
+            self._set_waiting(index, value)
+        elif column == 'in_hand':
+            self._set_in_hand(index, value)
+        elif column == 'current_bets':
+            self._set_current_bet(index, value)
+        else:
+            getattr(self, column)[index] = value
+
+    def _set_bet(self, index, bet):
+        self.bet_counts[self.bets[index]] -= 1
+        self.bet_counts[bet] += 1
+        self.bets[index] = bet
+
+    def _set_waiting(self, index, waiting):
+        self.num_waiting += bool(waiting) - self.waiting[index]
+        self.waiting[index] = bool(waiting)
+
+    def _set_in_hand(self, index, in_hand):
+        self.num_in_hand += bool(in_hand) - self.in_hand[index]
+        self.in_hand[index] = bool(in_hand)
+
+    def _set_current_bet(self, index, current_bet):
+        previous = self.current_bets[index]
+        self.current_bets[index] = current_bet
+        if current_bet >= self.highest_bet:
+            self.highest_bet = current_bet
+        elif previous == self.highest_bet:
+            # Only a lowered bet that was the highest one needs a rescan
+            self._rescan_highest_bet()
+
+    def _rescan_highest_bet(self):
+        self.highest_bet = max([bet for bet, seated in zip(self.current_bets, self.seated) if seated], default=0)
+
+    def street(self):
+        """Returns the current street, judging by which street logs have been saved"""
+        if self.preflop_log is None:
+            return "Preflop"
+        elif self.flop_log is None:
+            return "Flop"
+        elif self.turn_log is None:
+            return "Turn"
+        return "River"
 
     def renew(self):
         if self.preflop_log is None:
-            self.preflop_log = self.log.copy()
+            self.preflop_log = StreetLog(self)
         elif self.flop_log is None:
-            self.flop_log = self.log.copy()
+            self.flop_log = StreetLog(self)
         elif self.turn_log is None:
-            self.turn_log = self.log.copy()
-        for player, player_dict in self.log.items():
-            self.log[player]["Action"] = None
-            self.log[player]["Bet"] = 0
-            self.log[player]["Waiting"] = True
-            self.log[player]["In hand"] = True
-            self.log[player]["Total raises"] = 0
-            self.log[player]["Current bet"] = 0
+            self.turn_log = StreetLog(self)
+        num_seats = len(self.seated)
+        self.actions[:] = [None] * num_seats
+        self.bets[:] = array('d', [0] * num_seats)
+        self.waiting[:] = array('b', self.seated)
+        self.in_hand[:] = array('b', self.seated)
+        self.total_raises[:] = [0] * num_seats
+        self.current_bets[:] = array('d', [0] * num_seats)
+        self.highest_bet = 0
+        self.num_in_hand = self.num_waiting = self.num_players
+        self.bet_counts = collections.Counter({0: self.num_players})
+        self.raises = 0
+        self.last_aggressor = None
 
     def clear_aggressors(self, aggressor):
-        for player in self.log:
-            if "Preflop aggressor" in self.log[player]["Notes"] and player != aggressor:
-                self.log[player]["Notes"].remove("Preflop aggressor")
+        for index, notes in enumerate(self.notes):
+            if "Preflop aggressor" in notes and index != aggressor - 1 and self.seated[index]:
+                notes.remove("Preflop aggressor")
 
     def add_stacks(self, stacks):
-        for player in self.log:
-            self.log[player]["Stack"] = stacks[player - 1]
+        for index, seated in enumerate(self.seated):
+            if seated:
+                self.stacks[index] = stacks[index]
 
     def current_bet(self):
-        ind_bets = []
-        for player in self.log:
-            ind_bets.append(self.log[player]['Current bet'])
-        return max(ind_bets)
+        return self.highest_bet
 
     def num_raises(self):
-        return len(self.all_raises)
+        return self.raises
+
+    def num_callers(self):
+        """Returns the number of players other than the bettor who have put in the current bet"""
+        return self.bet_counts[self.highest_bet] - 1
 
     def new_raise(self, position, raise_amt):
-        for player in self.log:
-            if player != position and self.log[player]["In hand"]:
-                self.log[player]["Waiting"] = True
+        self.new_bet(position)
         self.all_raises.append(raise_amt)
+        self.raises += 1
 
     def new_bet(self, position):
         for player in self.log:
-            if player != position and self.log[player]["In hand"]:
-                self.log[player]["Waiting"] = True
+            if player != position and self.in_hand[player - 1]:
+                self._set_waiting(player - 1, True)
 
     def remove_player(self, position):
-        del self.log[position]
+        if position not in self.log:
+            raise KeyError(position)
+        index = position - 1
+        self.seated[index] = 0
         self.num_players -= 1
+        self.num_in_hand -= self.in_hand[index]
+        self.num_waiting -= self.waiting[index]
+        self.bet_counts[self.bets[index]] -= 1
+        # Unseated players count as out of the hand and done acting, as if they were gone from the columns
+        self.in_hand[index] = self.waiting[index] = 0
+        self.bets[index] = self.current_bets[index] = 0
+        self._rescan_highest_bet()
@@ -0,0 +1,88 @@
+from Setup import *
+
+
+def canonical_key(hand, board=()):
+    """Maps a hand and board to a key shared by every suit-isomorphic version of the same spot
+
+    E.g. Ah Kh on Qh 7h 2c and As Ks on Qs 7s 2d give the same key. Suits are renamed in order of how they appear
+    in the hand, then on the flop, turn and river, so two suits only ever swap when that changes nothing.
+
+    Args:
+        hand (list): The hole cards
+        board (list): The community cards in the order they were dealt
+
+    Returns:
+        A tuple of integer cards: the hand, the flop, then the turn and river, each sorted from highest to lowest
+    """
+    groups = [to_ints(hand), to_ints(board[0:3]), to_ints(board[3:4]), to_ints(board[4:5])]
+    signatures = [[0] * len(groups) for suit in range(4)]
+    for index, group in enumerate(groups):
+        for card in group:
+            signatures[card & 3][index] |= rank_bits[card]
+    order = sorted(range(4), key=signatures.__getitem__, reverse=True)
+    renamed = [0] * 4
+    for suit, original in enumerate(order):
+        renamed[original] = suit
+    return tuple(card for group in groups for card in sorted([card & ~3 | renamed[card & 3] for card in group],
+                                                             reverse=True))
+
+
+class LRUCache:
+    """A bounded cache that evicts the least recently used entry once it is full
+
+    Args:
+        maxsize (int): The most entries kept at once
+
+    Attributes:
+        hits (int): Lookups that found an entry
+        misses (int): Lookups that found nothing
+        evictions (int): Entries dropped to make room
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Returns the cached value for a key, marking it as recently used, or default if there is none"""
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Stores a value, evicting the least recently used entries if the cache is over its size"""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self._evict()
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        self._evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+    def _evict(self):
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+# Shared by Postflop and the equity functions. Keys start with the name of the function that stored them.
+results_cache = LRUCache()
@@ -0,0 +1,317 @@
+from Setup import *
+from Cache import *
+from Range import *
+import math
+import multiprocessing
+
+EquityResult = collections.namedtuple('EquityResult', ['equity', 'win', 'tie', 'std_error', 'trials'])
+EquityResult.__doc__ = """Equity of a hand
+
+    Attributes:
+        equity (float): Share of the pot won on average, counting split pots as fractions
+        win (float): Fraction of runouts won outright
+        tie (float): Fraction of runouts that ended in a split pot
+        std_error (float): Standard error of the equity estimate (0 when enumerated exactly)
+        trials (int): Number of runouts the estimate is based on
+    """
+
+
+def _as_ranges(opponents):
+    """Splits the opponents into a list of ranges and a number of random hands
+
+    Each range is returned as a tuple of an (M, 2) array of hands and the probability of each hand.
+    """
+    if isinstance(opponents, int):
+        return [], opponents
+    ranges, num_random = [], 0
+    for opponent in opponents:
+        if opponent is None:
+            num_random += 1
+            continue
+        if isinstance(opponent, Range):
+            combos, weights = opponent.hands()
+            ranges.append((combos.astype(np.int64), weights / weights.sum()))
+            continue
+        hands = [opponent] if isinstance(opponent[0], (int, str, Card)) else opponent
+        combos = np.array([to_ints(hand) for hand in hands], dtype=np.int64)
+        ranges.append((combos, np.full(len(combos), 1 / len(combos))))
+    return ranges, num_random
+
+
+def _equity_shard(hand, board, dead, ranges, num_random, trials, seed, chunk_size=20000):
+    """Plays out random runouts for one worker
+
+    Returns:
+        A tuple with the number of valid trials, wins, ties, the sum of equities and the sum of squared equities
+    """
+    rng = np.random.default_rng(seed)
+    known = np.zeros(52, dtype=bool)
+    known[hand + board + dead] = True
+    need = 2 * num_random + 5 - len(board)
+    board_key = sum(card_keys[card] for card in board)
+    board_bits = sum(card_bits[card] for card in board)
+    hero_key = sum(card_keys[card] for card in hand)
+    hero_bits = sum(card_bits[card] for card in hand)
+
+    totals = np.zeros(5)
+    while trials > 0:
+        n = min(chunk_size, trials)
+        trials -= n
+        rows = np.arange(n)
+        blocked = np.tile(known, (n, 1))
+        valid = np.ones(n, dtype=bool)
+
+        # Opponents with a range get a hand from it, discarding the trial if it collides with a card already out
+        opponent_hands = []
+        for combos, probabilities in ranges:
+            picks = combos[rng.choice(len(combos), size=n, p=probabilities)]
+            valid &= ~(blocked[rows, picks[:, 0]] | blocked[rows, picks[:, 1]])
+            blocked[rows, picks[:, 0]] = True
+            blocked[rows, picks[:, 1]] = True
+            opponent_hands.append(picks)
+
+        # Deal the random hands and the rest of the board from what is left of the deck
+        if need:
+            priorities = rng.random((n, 52))
+            priorities[blocked] = 2
+            drawn = np.argpartition(priorities, need - 1, axis=1)[:, :need]
+            drawn = np.take_along_axis(drawn, np.argsort(np.take_along_axis(priorities, drawn, axis=1), axis=1),
+                                       axis=1)
+        else:
+            drawn = np.zeros((n, 0), dtype=np.int64)
+        opponent_hands += [drawn[:, 2 * i:2 * i + 2] for i in range(num_random)]
+        runout = drawn[:, 2 * num_random:]
+
+        keys = board_key + card_keys_array[runout].sum(axis=1)
+        bits = board_bits + card_bits_array[runout].sum(axis=1)
+        hero = evaluate_keys(keys + hero_key, bits + hero_bits, 7)
+        opponents = np.stack([evaluate_keys(keys + card_keys_array[cards].sum(axis=1),
+                                            bits + card_bits_array[cards].sum(axis=1), 7)
+                              for cards in opponent_hands], axis=1)
+
+        hero, opponents = hero[valid], opponents[valid]
+        best = opponents.max(axis=1)
+        win = hero > best
+        tie = hero == best
+        equity = np.where(win, 1.0, np.where(tie, 1 / (1 + (opponents == hero[:, None]).sum(axis=1)), 0.0))
+        totals += [hero.size, win.sum(), tie.sum(), equity.sum(), (equity ** 2).sum()]
+    return tuple(totals)
+
+
+def _combine(shards):
+    """Merges the totals of several shards into an EquityResult"""
+    trials, wins, ties, equity, equity_squared = np.sum(shards, axis=0)
+    if trials == 0:
+        raise ValueError('No valid runouts; the opponents\' ranges are blocked by the known cards')
+    mean = equity / trials
+    variance = max(equity_squared / trials - mean ** 2, 0)
+    return EquityResult(float(mean), float(wins / trials), float(ties / trials), float((variance / trials) ** 0.5),
+                        int(trials))
+
+
+def monte_carlo_equity(hand, opponents=1, board=None, dead=None, trials=100000, processes=None, seed=None):
+    """Estimates the equity of a hand by dealing random runouts
+
+    Trials are split into one shard per process, each with its own random stream spawned from the seed, so
+    results are reproducible for a given seed and number of processes.
+
+    Args:
+        hand (list): The two hole cards
+        opponents (int or list): Either the number of opponents holding random hands, or a list with one entry per
+            opponent that is a hand, a Range, a list of hands, or None for a random hand
+        board (list): Community cards already dealt (0, 3, 4 or 5 cards)
+        dead (list): Other cards known to be out of the deck
+        trials (int): Number of runouts to deal
+        processes (int): Number of worker processes, defaulting to the number of cores
+        seed (int): Seed for the random streams
+
+    Returns:
+        An EquityResult
+    """
+    hand = to_ints(hand)
+    board = to_ints(board or [])
+    dead = to_ints(dead or [])
+    ranges, num_random = _as_ranges(opponents)
+    if not ranges and num_random < 1:
+        raise ValueError('At least one opponent is needed')
+
+    processes = pool_size(processes, trials)
+    seeds = np.random.SeedSequence(seed).spawn(processes)
+    tasks = [(hand, board, dead, ranges, num_random, trials // processes + (shard < trials % processes),
+              seeds[shard]) for shard in range(processes)]
+    if processes == 1:
+        return _combine([_equity_shard(*tasks[0])])
+    with multiprocessing.Pool(processes) as pool:
+        return _combine(pool.starmap(_equity_shard, tasks))
+
+
+def _runouts(deck, num_cards):
+    """Returns every way of dealing num_cards more board cards from the deck as an (M, num_cards) array"""
+    runouts = list(itertools.combinations(deck, num_cards))
+    return np.array(runouts, dtype=np.int64).reshape(len(runouts), num_cards)
+
+
+def _opponent_hands(ranges, num_random, deck):
+    """Lists the hands and weights each opponent may hold, dealing every remaining combination to random hands"""
+    random_hands = [(list(combination), 1.0) for combination in itertools.combinations(deck, 2)]
+    return [list(zip(combos.tolist(), probabilities.tolist())) for combos, probabilities in ranges] \
+        + [random_hands] * num_random
+
+
+def exact_equity(hand, opponents=1, board=None, dead=None):
+    """Computes the exact equity of a hand by enumerating every runout and every holding of the opponents
+
+    The board and every runout are evaluated once: the summed keys of the known board and of each runout are shared
+    by all players, so every player's hand is scored by adding just their two hole cards. Results against random
+    hands are kept in results_cache under the spot's canonical key.
+
+    Args:
+        hand (list): The two hole cards
+        opponents (int or list): Same as for monte_carlo_equity
+        board (list): Community cards already dealt (0, 3, 4 or 5 cards)
+        dead (list): Other cards known to be out of the deck
+
+    Returns:
+        An EquityResult with a standard error of 0
+    """
+    hand = to_ints(hand)
+    board = to_ints(board or [])
+    dead = to_ints(dead or [])
+    # Only spots against random hands are the same for every suit-isomorphic version
+    if isinstance(opponents, int) and not dead:
+        key = ('exact_equity', opponents) + canonical_key(hand, board)
+        result = results_cache.get(key)
+        if result is None:
+            result = exact_equity(hand, [None] * opponents, board)
+            results_cache.put(key, result)
+        return result
+    ranges, num_random = _as_ranges(opponents)
+    known = set(hand + board + dead)
+    deck = [card for card in range(52) if card not in known]
+
+    runouts = _runouts(deck, 5 - len(board))
+    keys = sum(card_keys[card] for card in board) + card_keys_array[runouts].sum(axis=1)
+    bits = sum(card_bits[card] for card in board) + card_bits_array[runouts].sum(axis=1)
+    hero = evaluate_keys(keys + sum(card_keys[card] for card in hand), bits + sum(card_bits[card] for card in hand), 7)
+
+    totals = np.zeros(5)
+    num_runouts = 0
+    for weighted_holdings in itertools.product(*_opponent_hands(ranges, num_random, deck)):
+        holdings = [holding for holding, weight in weighted_holdings]
+        weight = math.prod(weight for holding, weight in weighted_holdings)
+        held = [card for holding in holdings for card in holding]
+        held_bits = sum(card_bits[card] for card in held)
+        if len(set(held)) < len(held) or known.intersection(held):
+            continue
+        # Only the runouts that don't use any of the opponents' cards are possible
+        possible = (bits & held_bits) == 0
+        opponent_strengths = np.stack([evaluate_keys(keys[possible] + card_keys[holding[0]] + card_keys[holding[1]],
+                                                     bits[possible] + card_bits[holding[0]] + card_bits[holding[1]], 7)
+                                       for holding in holdings], axis=1)
+        hero_strengths = hero[possible]
+        best = opponent_strengths.max(axis=1)
+        win = hero_strengths > best
+        tie = hero_strengths == best
+        shares = np.where(win, 1.0, np.where(tie, 1 / (1 + (opponent_strengths == hero_strengths[:, None]).sum(axis=1)),
+                                             0.0))
+        totals += weight * np.array([hero_strengths.size, win.sum(), tie.sum(), shares.sum(), 0])
+        num_runouts += hero_strengths.size
+    return _combine([totals])._replace(std_error=0.0, trials=num_runouts)
+
+
+def equity(hand, opponents=1, board=None, dead=None, budget=2000000, trials=100000, processes=None, seed=None):
+    """Computes the equity of a hand exactly when that is affordable and estimates it by Monte Carlo otherwise
+
+    Exact results against random hands are cached by exact_equity. Monte Carlo estimates are not cached, since they
+    change with the seed and the number of processes.
+
+    Args:
+        hand (list): The two hole cards
+        opponents (int or list): Same as for monte_carlo_equity
+        board (list): Community cards already dealt (0, 3, 4 or 5 cards)
+        dead (list): Other cards known to be out of the deck
+        budget (int): Largest number of (opponent holdings, runout) pairs to enumerate exactly
+        trials (int): Number of runouts to deal when falling back to Monte Carlo
+        processes (int): Number of worker processes for Monte Carlo
+        seed (int): Seed for Monte Carlo
+
+    Returns:
+        An EquityResult
+    """
+    ranges, num_random = _as_ranges(opponents)
+    unseen = 52 - len(hand) - len(board or []) - len(dead or [])
+    holdings = math.prod(len(combos) for combos, probabilities in ranges) * math.comb(unseen, 2) ** num_random
+    dealt = sum(len(combos[0]) for combos, probabilities in ranges) + 2 * num_random
+    if holdings * math.comb(unseen - dealt, 5 - len(board or [])) <= budget:
+        return exact_equity(hand, opponents, board, dead)
+    return monte_carlo_equity(hand, opponents, board, dead, trials, processes, seed)
+
+
+def range_vs_range(range1, range2, board, dead=None):
+    """Computes the equity of every combination of one range against every combination of another on a board
+
+    Each runout of the board is evaluated once for every combination of both ranges, and the two columns of
+    strengths are then compared by broadcasting. Split pots count as half.
+
+    Args:
+        range1 (Range): The first player's range
+        range2 (Range): The second player's range
+        board (list): Community cards already dealt (3, 4 or 5 cards)
+        dead (list): Other cards known to be out of the deck
+
+    Returns:
+        A (1326, 1326) array of the equity of combination i of range1 against combination j of range2, indexed like
+        combo_cards, with NaN where either combination is outside its range or the two can't both be dealt
+    """
+    board = to_ints(board)
+    known = cards_mask(board) | cards_mask(dead or [])
+    present1 = np.flatnonzero((range1.weights > 0) & ((combo_masks & known) == 0))
+    present2 = np.flatnonzero((range2.weights > 0) & ((combo_masks & known) == 0))
+    deck = mask_cards(~known & full_mask)
+    runouts = _runouts(deck, 5 - len(board))
+    keys = (sum(card_keys[card] for card in board) + card_keys_array[runouts].sum(axis=1))[:, None]
+    bits = (sum(card_bits[card] for card in board) + card_bits_array[runouts].sum(axis=1))[:, None]
+
+    def strengths(present):
+        combos = combo_cards[present].astype(np.int64)
+        return evaluate_keys(keys + card_keys_array[combos].sum(axis=1), bits + combo_masks[present], 7).astype(np.int32)
+
+    strengths1, strengths2 = strengths(present1), strengths(present2)
+    runout_masks = bits[:, 0] - sum(card_bits[card] for card in board)
+    points = np.zeros((present1.size, present2.size))
+    counts = np.zeros((present1.size, present2.size))
+    for runout in range(len(runouts)):
+        live1 = (combo_masks[present1] & runout_masks[runout]) == 0
+        live2 = (combo_masks[present2] & runout_masks[runout]) == 0
+        live = live1[:, None] & live2[None, :]
+        points += live * (np.sign(strengths1[runout][:, None] - strengths2[runout][None, :]) + 1)
+        counts += live
+
+    matrix = np.full((len(combo_cards), len(combo_cards)), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        equities = points / (2 * counts)
+    # Combinations sharing a card can't face each other
+    equities[(combo_masks[present1][:, None] & combo_masks[present2][None, :]) != 0] = np.nan
+    matrix[np.ix_(present1, present2)] = equities
+    return matrix
+
+
+def range_equities(range1, range2, board, dead=None):
+    """Computes how each combination of one range fares against another range on a board
+
+    Args:
+        range1 (Range): The first player's range
+        range2 (Range): The second player's range
+        board (list): Community cards already dealt (3, 4 or 5 cards)
+        dead (list): Other cards known to be out of the deck
+
+    Returns:
+        A tuple of a (1326,) array with the equity of each combination of range1 against range2, weighted by range2
+        and NaN outside range1, and the overall equity of range1 against range2
+    """
+    matrix = range_vs_range(range1, range2, board, dead)
+    pair_weights = np.where(np.isnan(matrix), 0, range1.weights[:, None] * range2.weights[None, :])
+    matrix = np.nan_to_num(matrix)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        combo_equities = (matrix * pair_weights).sum(axis=1) / pair_weights.sum(axis=1)
+    return combo_equities, float((matrix * pair_weights).sum() / pair_weights.sum())
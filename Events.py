@@ -0,0 +1,268 @@
+from Setup import *
+import json
+
+# Events that Game emits once for every change to the state of a hand, in the order they happen. Subscribers are
+# objects with a handle(event) method, so console output, hand histories and statistics are all optional listeners
+# and a headless game builds no events at all.
+HandStart = collections.namedtuple('HandStart', ['hand', 'num_players', 'small_blind', 'big_blind', 'stacks'])
+HandStart.__doc__ = """A new hand begins
+
+    Attributes:
+        hand (int): Number of the hand, counting from 1 for each Game
+        num_players (int): Number of players at the table
+        small_blind (float): Value of small blind
+        big_blind (float): Value of big blind
+        stacks (tuple): Each seat's chips at the start of the hand
+    """
+
+Deal = collections.namedtuple('Deal', ['position', 'cards'])
+Deal.__doc__ = """Hole cards are dealt to a player
+
+    Attributes:
+        position (int): The player's seat
+        cards (tuple): The two hole cards as integers
+    """
+
+PostBlind = collections.namedtuple('PostBlind', ['position', 'blind', 'amount', 'stack', 'pot'])
+PostBlind.__doc__ = """A player posts a blind
+
+    Attributes:
+        position (int): The player's seat
+        blind (str): 'SB' or 'BB'
+        amount (float): Chips posted
+        stack (float): The player's chips left behind
+        pot (float): Chips in the pot, including bets on the current street
+    """
+
+PlayerAction = collections.namedtuple('PlayerAction', ['position', 'action', 'bet', 'stack', 'pot'])
+PlayerAction.__doc__ = """A player acts
+
+    Attributes:
+        position (int): The player's seat
+        action (str): 'FOLD', 'CHECK', 'CALL', 'BET', 'RAISE' or 'ALL IN'
+        bet (float): The player's total bet on this street after the action
+        stack (float): The player's chips left behind
+        pot (float): Chips in the pot, including bets on the current street
+    """
+
+StreetChange = collections.namedtuple('StreetChange', ['street', 'board'])
+StreetChange.__doc__ = """Community cards are dealt and a new betting round starts
+
+    Attributes:
+        street (str): 'flop', 'turn' or 'river'
+        board (tuple): Every community card dealt so far
+    """
+
+PotUpdate = collections.namedtuple('PotUpdate', ['pot', 'stacks'])
+PotUpdate.__doc__ = """The street's bets are collected into the pot, returning any uncalled part of the largest bet
+
+    Attributes:
+        pot (float): Chips in the pot
+        stacks (tuple): Every seat's chips after the uncalled bet is returned
+    """
+
+Showdown = collections.namedtuple('Showdown', ['board', 'hands', 'winners', 'pot', 'won', 'stacks'])
+Showdown.__doc__ = """The main pot and any side pots are awarded
+
+    Attributes:
+        board (tuple): The community cards, run out to five if the hand went to showdown
+        hands (dict): The hole cards shown, keyed by position, empty if the last player left took the pot unseen
+        winners (tuple): Positions that won at least part of the pot
+        pot (float): Chips in the pot
+        won (tuple): Chips won by each of the winners
+        stacks (tuple): Every seat's chips at the end of the hand
+    """
+
+events = {event_type.__name__: event_type for event_type in
+          (HandStart, Deal, PostBlind, PlayerAction, StreetChange, PotUpdate, Showdown)}
+
+
+class ConsoleRenderer:
+    """Prints the table after each action, as a human player at the console sees it
+
+    Args:
+        output (function): Called with each line of output, e.g. print
+    """
+
+    def __init__(self, output=print):
+        self.output = output
+        self.num_players = 0
+        self.board = ()
+        self.pot = 0
+        self.stacks = []
+        self.bets = []
+        self.actions = []
+
+    def handle(self, event):
+        kind = type(event)
+        if kind is HandStart:
+            self.num_players = event.num_players
+            self.board = ()
+            self.pot = 0
+            self.stacks = list(event.stacks)
+            self.bets = [0] * event.num_players
+            self.actions = [None] * event.num_players
+        elif kind is PostBlind:
+            self.update(event.position, event.blind, event.amount, event.stack, event.pot)
+            if event.blind == 'BB':
+                self.table()
+                self.output("\n")
+        elif kind is Deal:
+            self.output("Player " + str(event.position) + " Hand: " + " ".join(to_strs(event.cards)))
+        elif kind is PlayerAction:
+            self.output(event.action.title() + (" " + "{:.2f}".format(event.bet)
+                                                if event.action not in ("FOLD", "CHECK") else ""))
+            self.update(event.position, event.action, event.bet, event.stack, event.pot)
+            self.table()
+            self.output("\n")
+        elif kind is PotUpdate:
+            self.pot = event.pot
+            self.stacks = list(event.stacks)
+            self.bets = [0] * self.num_players
+        elif kind is StreetChange:
+            self.board = event.board
+            self.table()
+        elif kind is Showdown:
+            for position, cards in event.hands.items():
+                self.output("Player {} shows {}".format(position, " ".join(to_strs(cards))))
+            for position, won in zip(event.winners, event.won):
+                self.output("Player {} won {}".format(position, "{:.2f}".format(won)))
+
+    def update(self, position, action, bet, stack, pot):
+        self.actions[position - 1] = action
+        self.bets[position - 1] = bet
+        self.stacks[position - 1] = stack
+        self.pot = pot
+
+    def table(self):
+        self.output("=" * 40)
+        if self.board:
+            self.output("Board: " + " ".join(to_strs(self.board)))
+        self.output("Pot: " + "{:.2f}".format(self.pot))
+        for index in range(self.num_players):
+            player = "Player " + str(index + 1) + ": "
+            if self.actions[index] == "FOLD":
+                player += "Folded"
+            elif self.actions[index] == "ALL IN":
+                player += "All in " + "{:.2f}".format(self.bets[index])
+            else:
+                player += "{:.2f}".format(self.bets[index])
+            self.output('%-27s %s' % (player, "Stack: " + "{:.2f}".format(self.stacks[index])))
+        self.output("=" * 40)
+
+
+def event_record(event):
+    """Returns an event as a dictionary that converts to JSON, with its name under 'event' and cards as strings"""
+    record = event._asdict()
+    for field in ('cards', 'board'):
+        if field in record:
+            record[field] = to_strs(record[field])
+    if 'hands' in record:
+        record['hands'] = {str(position): to_strs(cards) for position, cards in record['hands'].items()}
+    record['event'] = type(event).__name__
+    return record
+
+
+class HandHistoryWriter:
+    """Writes each hand as one line of JSON, listing its events with the cards as strings such as 'Ah'
+
+    Args:
+        file (file): A text file open for writing
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.hand = []
+
+    def handle(self, event):
+        self.hand.append(event_record(event))
+        if type(event) is Showdown:
+            self.file.write(json.dumps(self.hand, separators=(',', ':')) + '\n')
+            self.hand = []
+
+
+def read_hand_histories(file):
+    """Reads the hands written by a HandHistoryWriter back into lists of events
+
+    Args:
+        file (file): A text file open for reading
+
+    Yields:
+        A list of events for each hand
+    """
+    for line in file:
+        hand = []
+        for record in json.loads(line):
+            event_type = events[record.pop('event')]
+            for field in ('cards', 'board'):
+                if field in record:
+                    record[field] = tuple(to_ints(record[field]))
+            if 'hands' in record:
+                record['hands'] = {int(position): tuple(to_ints(cards)) for position, cards in record['hands'].items()}
+            for field in ('stacks', 'winners', 'won'):
+                if field in record:
+                    record[field] = tuple(record[field])
+            hand.append(event_type(**record))
+        yield hand
+
+
+class Metrics:
+    """Counts actions and results over many hands
+
+    Attributes:
+        hands (int): Hands played
+        actions (Counter): Number of times each action was taken
+        voluntary (list): Hands in which each seat put chips in the pot preflop without being forced to
+        preflop_raises (list): Hands in which each seat raised preflop
+        showdowns (int): Hands that went to showdown
+        total_pot (float): Chips in all the pots awarded
+    """
+
+    def __init__(self):
+        self.hands = 0
+        self.actions = collections.Counter()
+        self.voluntary = []
+        self.preflop_raises = []
+        self.showdowns = 0
+        self.total_pot = 0
+        self.preflop = True
+        self.highest_bet = 0
+        self.seen = set()
+        self.raised = set()
+
+    def handle(self, event):
+        kind = type(event)
+        if kind is PlayerAction:
+            self.actions[event.action] += 1
+            if self.preflop and event.action not in ("FOLD", "CHECK"):
+                self.seen.add(event.position)
+                if event.bet > self.highest_bet:
+                    self.raised.add(event.position)
+                    self.highest_bet = event.bet
+        elif kind is PostBlind:
+            self.highest_bet = max(self.highest_bet, event.amount)
+        elif kind is HandStart:
+            self.hands += 1
+            self.preflop = True
+            self.highest_bet = 0
+            self.seen.clear()
+            self.raised.clear()
+            if len(self.voluntary) < event.num_players:
+                self.voluntary += [0] * (event.num_players - len(self.voluntary))
+                self.preflop_raises += [0] * (event.num_players - len(self.preflop_raises))
+        elif kind is StreetChange:
+            self.preflop = False
+        elif kind is Showdown:
+            self.showdowns += bool(event.hands)
+            self.total_pot += event.pot
+            for position in self.seen:
+                self.voluntary[position - 1] += 1
+            for position in self.raised:
+                self.preflop_raises[position - 1] += 1
+
+    def summary(self):
+        """Returns the average pot, the share of hands that reached showdown and each seat's VPIP and PFR"""
+        hands = max(self.hands, 1)
+        return {'average_pot': self.total_pot / hands, 'showdown_rate': self.showdowns / hands,
+                'vpip': [count / hands for count in self.voluntary],
+                'pfr': [count / hands for count in self.preflop_raises]}
@@ -1,80 +1,126 @@
 from Setup import *
 from Action import *
+from Events import *
+from Pot import *
+
+
+class BotAgent:
+    """Plays a seat with the actions suggested by Action
+
+    Args:
+        profile (Profile): Preflop strategy profile, using the built-in Preflop rules if None
+    """
+
+    def __init__(self, profile=None):
+        self.profile = profile
+        # The Postflop of each seat's current hand, so the flop analysis carries over to the turn and river
+        self.postflops = {}
+
+    def assessment(self, position, cards):
+        """Returns the Postflop kept for a seat's hand since the flop, dealing it the new board cards"""
+        postflop = self.postflops.get(position)
+        if postflop is None or postflop.card_list != cards[:postflop.num_cards]:
+            postflop = self.postflops[position] = Postflop(cards[:5])
+        for card in cards[postflop.num_cards:]:
+            postflop.deal(card)
+        return postflop
+
+    def act(self, game, position):
+        """Returns an action string such as "Fold", "Check", "Call" or "Raise 0.35" for a seat"""
+        log = game.action
+        cards = game.temp_card_holder[position] + game.board
+        suggestion = Action(cards, position, game.num_players, log.stacks[position - 1], game.small_blind,
+                            game.big_blind, game.pot(), log, self.profile,
+                            self.assessment(position, cards) if len(cards) >= 5 else None).suggest()
+        # Never fold when checking is free
+        if suggestion is None or suggestion.split()[0].upper() in ("FOLD", "SIT") \
+                and log.bets[position - 1] == log.current_bet():
+            return "Check"
+        return suggestion
+
+
+class ConsoleAgent:
+    """Asks at the console for every action of a seat"""
+
+    def act(self, game, position):
+        print("Player " + str(position) + " Hand: " + " ".join(to_strs(game.temp_card_holder[position])))
+        button = input(game.options(position)).strip()
+        if button.upper() in ("RAISE", "BET"):
+            button += " " + input("Raise to: ")
+        return button
 
 
 class Game:
-    """Plays out a round of poker starting with preflop action.
+    """Plays out rounds of poker from the blinds to the showdown
+
+    Every seat is played by an agent with an act(game, position) method that returns an action string. The game
+    reports each change to the hand as an event from the Events module to its subscribers, and produces no output
+    of its own, so with output=None and no subscribers a hand runs without any I/O or event objects.
 
     Args:
         num_players (int): Number of players at the table
-        starting_stacks (list): Chip counts for each player at the table
         small_blind (float): Value of small blind
         big_blind (float): Value of big blind
+        starting_stacks (list): Chip counts for each player at the table
+        agents (list): One agent per seat, or a dictionary of agents keyed by position. Seats without an agent are
+            played by a BotAgent
+        output (function): Called with each line of a ConsoleRenderer's output, e.g. print, or None for no renderer
+        seed (int): Seed for the shuffle
+        subscribers (list): Objects with a handle(event) method that are sent every event
 
     Attributes:
         action (Log): An instance of the Log class. This keeps track of all actions at the table
         temp_card_holder (dict): Contains the dealt hand for each player
         dealer (Dealer): An instance of the Dealer class
+        board (list): The community cards dealt so far
+        chips (Pot): The hand's chips in whole units, from which the stacks, bets and pot in the log are set
+        winners (list): Positions that won the last hand
+        hand_number (int): Number of hands started
     """
 
-    def __init__(self, num_players, small_blind, big_blind, starting_stacks):
+    def __init__(self, num_players, small_blind, big_blind, starting_stacks, agents=None, output=print, seed=None,
+                 subscribers=None):
         self.num_players = num_players
-        self.action = Log(num_players)
-        self.stacks = starting_stacks
-        self.action.add_stacks(starting_stacks)
+        self.stacks = list(starting_stacks)
         self.small_blind = small_blind
         self.big_blind = big_blind
+        if isinstance(agents, dict):
+            self.agents = {position: agents.get(position) or BotAgent() for position in range(1, num_players + 1)}
+        else:
+            agents = agents or [BotAgent()] * num_players
+            self.agents = {position: agent for position, agent in enumerate(agents, 1)}
+        self.subscribers = list(subscribers or [])
+        if output is not None:
+            self.subscribers.append(ConsoleRenderer(output))
+        self.rng = random.Random(seed)
+        self.hand_number = 0
+        self.new_hand()
+
+    def new_hand(self):
+        """Clears the table for a new hand, keeping the stacks"""
+        self.chips = Pot([to_units(stack) for stack in self.stacks])
+        self.action = Log(self.num_players)
+        self.action.add_stacks([to_chips(units) for units in self.chips.stacks])
         self.flop_cards = None
         self.turn_cards = None
         self.river_cards = None
+        self.board = []
         self.temp_card_holder = {}
-        for i in range(num_players):
-            self.temp_card_holder[i + 1] = 0
-        self.total_pot = 0
-        self.dealer = Dealer()
-
-    def display_log(self, on_flop=False, on_turn=False, on_river=False):
-        print("=" * 40)
-        if on_flop:
-            print("Board: " + str(self.flop_cards).strip("[]'").replace("', '", " "))
-        if on_turn:
-            print("Board: " + str(self.flop_cards).replace('[', '').replace(']', '') + " " + str(self.turn_cards))
-        if on_river:
-            print("Board: " + str(self.flop_cards).replace('[', '').replace(']', '') + " " + str(self.turn_cards)
-                  + " " + str(self.river_cards))
-
-        pot = self.get_pot()
-        print("Pot: " + "{:.2f}".format(pot))
-
-        for player_number in self.action.log:
-            if not self.action.log[player_number]["In hand"] and not self.action.log[player_number]["Waiting"]:
-                player_action = "Player " + str(player_number) + ": Folded"
-                player_stack = "Stack: " + "{:.2f}".format(self.action.log[player_number]["Stack"])
-                print('%-27s %s' % (player_action, player_stack))
-            elif self.action.log[player_number]["Action"] == "ALL IN":
-                player_action = "Player " + str(player_number) + ": All in " \
-                                + "{:.2f}".format(self.action.log[player_number]["Bet"])
-                player_stack = "Stack: " + "{:.2f}".format(self.action.log[player_number]["Stack"])
-                print('%-27s %s' % (player_action, player_stack))
-            else:
-                player_action = "Player " + str(player_number) + ": " + "{:.2f}".format(
-                    self.action.log[player_number]["Bet"])
-                player_stack = "Stack: " + "{:.2f}".format(self.action.log[player_number]["Stack"])
-                print('%-27s %s' % (player_action, player_stack))
-        print("=" * 40)
-
-    def get_pot(self):
-        pot = 0
-        for player_number in self.action.log:
-            pot += self.action.log[player_number]["Bet"]
-        if pot == 0:
-            return self.total_pot
-        elif pot < self.total_pot:
-            self.total_pot = pot + self.total_pot
-            return self.total_pot
-        else:
-            self.total_pot = pot
-            return self.total_pot
+        # In units, like every amount the game works out
+        self.min_raise = to_units(self.big_blind)
+        self.winners = []
+        self.dealer = Dealer(self.rng)
+
+    def emit(self, event_type, *fields):
+        """Sends an event to every subscriber, without building it when there are none"""
+        if self.subscribers:
+            event = event_type(*fields)
+            for subscriber in self.subscribers:
+                subscriber.handle(event)
+
+    def pot(self):
+        """Returns the chips in the pot, including bets on the current street"""
+        return to_chips(self.chips.total())
 
     def options(self, position_num):
         if self.action.log[position_num]["Bet"] != self.action.current_bet():
@@ -82,312 +128,233 @@ class Game:
         else:
             return "CHECK/BET/FOLD: "
 
-    def check_for_all_in(self, bet, position_num, action):
-        previous_bet = self.action.log[position_num]["Bet"]
-        if action == "CALL" and previous_bet != 0:
-            difference = bet - previous_bet
-            if self.action.log[position_num]["Stack"] <= difference:
-                return True
-        elif action == "RAISE" and previous_bet != 0:
-            difference = bet - previous_bet
-            if self.action.log[position_num]["Stack"] <= difference:
-                return True
-        else:
-            if self.action.log[position_num]["Stack"] <= bet:
-                return True
-        return False
+    def play_hand(self):
+        """Plays a full hand and returns how many chips each seat won or lost"""
+        return self.run(self.hand_steps())
 
-    def preflop(self):
-        # Setting up poker game
-        flop_exists = False
-        end_of_round = False
-        current_position = 1
+    def run(self, steps):
+        """Plays out a generator of steps such as hand_steps, asking the seats' agents for every action
 
-        # Deal cards to the table
-        for i in range(self.num_players):
-            dealt = self.dealer.deal_hand()
-            self.temp_card_holder[current_position] = dealt
-            if current_position == 8:
-                self.temp_card_holder[current_position] = ['8h', '9h']
-            current_position += 1
-            if current_position == self.num_players + 1:
-                current_position = 3
+        Returns:
+            The value the generator returns
+        """
+        try:
+            position = next(steps)
+            while True:
+                position = steps.send(self.agents[position].act(self, position))
+        except StopIteration as stop:
+            return stop.value
+
+    def hand_steps(self):
+        """Plays a full hand as a generator that yields the position of each player to act and is sent back their
+        action string, so that the actions can come from anywhere, e.g. a coroutine awaiting a remote player
+
+        Returns:
+            How many chips each seat won or lost
+        """
+        self.new_hand()
+        for street in (self.preflop_steps, self.flop_steps, self.turn_steps, self.river_steps):
+            yield from street()
+            if self.action.num_in_hand == 1:
                 break
+        self.showdown()
+        results = [to_chips(units - to_units(previous)) for units, previous in zip(self.chips.stacks, self.stacks)]
+        self.stacks = [to_chips(units) for units in self.chips.stacks]
+        return results
 
-        # Preflop action all around
-        end_preflop = False
-        display_blinds = True
-        while not end_preflop:
-            # Handle the small and big blinds to start preflop play
-            if display_blinds:
-                self.action.add(1, action='SB', bet=self.small_blind, waiting=True, in_hand=True,
-                                current_bet=self.small_blind)
-                self.action.add(2, action='BB', bet=self.big_blind, waiting=True, in_hand=True,
-                                current_bet=self.big_blind)
-                self.display_log()
-                print("\n")
-                display_blinds = False
-
-            # Stop round if everyone's turn is finished or if everyone's folded except for one player
-            flag_done = True
-            active_players = []
-            for i in range(1, self.num_players + 1):
-                if self.action.log[i]["Waiting"] and self.action.log[i]["In hand"]:
-                    flag_done = False
-                if self.action.log[i]["In hand"]:
-                    active_players.append(i)
-            if flag_done:
-                end_preflop = True
-            if len(active_players) == 1:
-                end_of_round = True
-                end_preflop = True
-                self.action.log[active_players[0]]['Stack'] += self.get_pot()
-                print("Player {} won {}".format(active_players[0], "{:.2f}".format(self.get_pot())))
-
-            # Model playing
-            # if current_position == position and action.log[current_position]["In hand"] \
-            #         and action.log[current_position]["Waiting"]:
-            if self.action.log[current_position]["In hand"] and self.action.log[current_position]["Waiting"] \
-                    and not end_preflop:
-                print("Player " + str(current_position) + " Hand: " + str(self.temp_card_holder[current_position])
-                      .strip("[]'").replace("', '", " "))
-                # game = Action(temp_card_holder[position], position, num_players, stack, small_blind, big_blind,
-                #               get_pot(), action)
-                game = Action(self.temp_card_holder[current_position], current_position, self.num_players,
-                              self.action.log[current_position]['Stack'], self.small_blind, self.big_blind,
-                              self.get_pot(), self.action)
-                to_do = game.preflop_action()
-                if len(to_do.split()) == 2:
-                    if len(to_do.split()[1]) >= 10:
-                        rounded = float(to_do.split()[1])
-                        print(to_do.split()[0] + ' ' + "{:.2f}".format(rounded))
-                    else:
-                        print(to_do)
-                else:
-                    print(to_do)
-                if to_do.split()[0].upper() == "FOLD":
-                    self.action.add(current_position, action="FOLD", waiting=False, in_hand=False)
-                if to_do.split()[0].upper() == "RAISE":
-                    raise_amt = round(float(to_do.split()[1]), 2)
-                    if self.check_for_all_in(raise_amt, current_position, "RAISE"):
-                        self.action.add(current_position, action="ALL IN",
-                                        bet=self.action.log[current_position]['Stack']
-                                        + self.action.log[current_position]['Bet'], waiting=False, in_hand=True,
-                                        current_bet=self.action.log[current_position]['Stack'] +
-                                        self.action.log[current_position]['Bet'], note="ALL IN")
-                    else:
-                        self.action.add(current_position, action="RAISE", bet=float(raise_amt), waiting=False,
-                                        in_hand=True, current_bet=raise_amt)
-                    self.action.new_raise(current_position, raise_amt)
-                if to_do.split()[0].upper() == "CALL":
-                    current_bet = self.action.current_bet()
-                    self.action.add(current_position, action="CALL", bet=current_bet, waiting=False, in_hand=True,
-                                    current_bet=current_bet)
-                self.display_log()
-                print("\n")
-
-            # # If a turn needs to be made
-            # elif action.log[current_position]["Waiting"] or action.log[current_position]["In hand"]:
-            #     print("Player " + str(current_position) + " Hand: " + str(temp_card_holder[current_position]).strip("[]'")
-            #           .replace("', '", " "))
-            #     valid_option_chosen = False
-            #     while not valid_option_chosen:
-            #         button = input(options(current_position))
-            #         if button.upper() == "FOLD":
-            #             action.add(current_position, action="FOLD", waiting=False, in_hand=False)
-            #             valid_option_chosen = True
-            #         elif button.upper() == "CALL":
-            #             current_bet = action.current_bet()
-            #             if check_for_all_in(current_bet, current_position):
-            #                 action.add(current_position, action="ALL IN", bet=action.log[current_position]['Stack']
-            #                                                                   + action.log[current_position]['Bet'],
-            #                            waiting=False, in_hand=True,
-            #                            current_bet=action.log[current_position]['Stack']
-            #                                        + action.log[current_position]['Bet'], note="ALL IN")
-            #             else:
-            #                 action.add(current_position, action="CALL", bet=current_bet, waiting=False, in_hand=True,
-            #                            current_bet=current_bet)
-            #             valid_option_chosen = True
-            #         elif button.upper() == "RAISE":
-            #             valid_raise_chosen = False
-            #             while not valid_raise_chosen:
-            #                 raise_amt = float(input("RAISE TO: "))
-            #                 if check_for_all_in(raise_amt, current_position):
-            #                     action.add(current_position, action="ALL IN", bet=action.log[current_position]['Stack']
-            #                                                                       + action.log[current_position]['Bet'],
-            #                                waiting=False, in_hand=True,
-            #                                current_bet=action.log[current_position]['Stack']
-            #                                            + action.log[current_position]['Bet'], note="ALL IN")
-            #                     valid_raise_chosen = True
-            #                 else:
-            #                     if action.current_bet() == big_blind:
-            #                         if raise_amt >= big_blind * 2:
-            #                             action.add(current_position, action="RAISE", bet=raise_amt, waiting=False,
-            #                                        in_hand=True, current_bet=raise_amt)
-            #                             valid_raise_chosen = True
-            #                     else:
-            #                         if len(action.all_raises) == 1:
-            #                             difference = action.all_raises[0] - big_blind
-            #                         else:
-            #                             difference = action.all_raises[-1] - action.all_raises[-2]
-            #                         b = action.current_bet()
-            #                         if raise_amt >= round(action.current_bet() + difference, 2):
-            #                             action.add(current_position, action="RAISE", bet=raise_amt, waiting=False,
-            #                                        in_hand=True, current_bet=raise_amt)
-            #                             valid_raise_chosen = True
-            #                 if not valid_raise_chosen:
-            #                     print("Invalid raise offered.")
-            #             action.new_raise(current_position, raise_amt)
-            #             valid_option_chosen = True
-            #         else:
-            #             print("Invalid option offered.")
-            #     display_log()
-            #     print("\n")
-
-            current_position += 1
-            if current_position == self.num_players + 1:
-                current_position = 1
+    def preflop(self):
+        self.run(self.preflop_steps())
 
     def flop(self):
-        # Flop action all around
-        end_flop = False
-        for i in range(1, self.num_players + 1):
-            if not self.action.log[i]['In hand']:
-                self.action.remove_player(i)
-        self.action.renew()
+        self.run(self.flop_steps())
+
+    def turn(self):
+        self.run(self.turn_steps())
+
+    def river(self):
+        self.run(self.river_steps())
 
-        # Flop stuff
-        flop_exists = True
+    def preflop_steps(self):
+        self.hand_number += 1
+        self.emit(HandStart, self.hand_number, self.num_players, self.small_blind, self.big_blind,
+                  tuple(self.stacks))
+
+        self.post_blinds()
+
+        # Deal cards to the table
+        for position in range(1, self.num_players + 1):
+            self.temp_card_holder[position] = self.dealer.deal_hand()
+            self.emit(Deal, position, tuple(self.temp_card_holder[position]))
+        yield from self.betting_steps(self.first_to_act())
+
+    def post_blinds(self):
+        """Handles the small and big blinds to start preflop play"""
+        for position, blind, amount in ((1, 'SB', self.small_blind), (2, 'BB', self.big_blind)):
+            units = min(to_units(amount), self.chips.stacks[position - 1])
+            self.bet(position, units, action=blind, waiting=True, in_hand=True)
+            self.emit(PostBlind, position, blind, to_chips(units), self.action.stacks[position - 1], self.pot())
+
+    def bet(self, position, units, **fields):
+        """Brings a player's bet on this street to a total in units and logs it along with any other fields"""
+        self.chips.bet(position, units)
+        amount = to_chips(units)
+        self.action.add(position, bet=amount, current_bet=amount, stack=to_chips(self.chips.stacks[position - 1]),
+                        **fields)
+
+    def first_to_act(self, preflop=True):
+        """Returns the position that opens the betting on a street"""
+        return 3 if preflop and self.num_players > 2 else 1
+
+    def flop_steps(self):
         self.flop_cards = self.dealer.flop()
-        self.display_log(on_flop=True)
-
-        while not end_flop:
-            for player in self.action.log:
-                print("Player " + str(player) + " Hand: " + str(self.temp_card_holder[player])
-                      .strip("[]'").replace("', '", " "))
-                buttons = self.options(player)
-                button = input(buttons)
-                if button == "FOLD":
-                    self.action.add(player, action="FOLD", waiting=False, in_hand=False)
-                if button == "CHECK":
-                    self.action.add(player, action="CHECK", waiting=False, in_hand=True)
-                if button == "CALL":
-                    current_bet = self.action.current_bet()
-                    self.action.add(player, action="CALL", bet=current_bet, waiting=False, in_hand=True,
-                                    current_bet=current_bet)
-                if button == "Raise":
-                    raise_amt = input("Raise to: ")
-                    self.action.add(player, action="Raise", bet=float(raise_amt), waiting=False, in_hand=True,
-                                    current_bet=float(raise_amt))
-                    self.action.new_raise(player, raise_amt)
-                if button == "BET":
-                    bet_amt = input("BET: ")
-                    self.action.add(player, action="BET", bet=float(bet_amt), waiting=False, in_hand=True,
-                                    current_bet=float(bet_amt))
-                    self.action.new_bet(player)
-                self.display_log(on_flop=True)
-                print("\n")
-
-                # Stop round if everyone's turn is finished
-                flag_done = True
-                for player_num in self.action.log:
-                    if self.action.log[player_num]["Waiting"] and self.action.log[player_num]["In hand"]:
-                        flag_done = False
-                        break
-                if flag_done:
-                    end_flop = True
-                    break
-    #
-    # # Turn action all around
-    # end_turn = False
-    # for player in action.log.copy():
-    #     if not action.log[player]['In hand']:
-    #         action.remove_player(player)
-    # action.renew()
-    #
-    # # Turn stuff
-    # turn = dealer.turn()
-    # display_log(on_turn=True)
-    #
-    # while not end_turn:
-    #     for player in action.log:
-    #         print("Player " + str(player) + " Hand: " + str(temp_card_holder[player]))
-    #         buttons = options(player)
-    #         button = input(buttons)
-    #         if button == "FOLD":
-    #             action.add(player, action="FOLD", waiting=False, in_hand=False)
-    #         if button == "CHECK":
-    #             action.add(player, action="CHECK", waiting=False, in_hand=True)
-    #         if button == "CALL":
-    #             current_bet = action.current_bet()
-    #             action.add(player, action="CALL", bet=current_bet, waiting=False, in_hand=True,
-    #                        current_bet=current_bet)
-    #         if button == "Raise":
-    #             raise_amt = input("Raise to: ")
-    #             action.add(player, action="Raise", bet=float(raise_amt), waiting=False, in_hand=True,
-    #                        current_bet=float(raise_amt))
-    #             action.new_raise(player, raise_amt)
-    #         if button == "BET":
-    #             bet_amt = input("BET: ")
-    #             action.add(player, action="BET", bet=float(bet_amt), waiting=False, in_hand=True,
-    #                        current_bet=float(bet_amt))
-    #             action.new_bet(player)
-    #         display_log()
-    #         print("\n")
-    #
-    #         # Stop round if everyone's turn is finished
-    #         flag_done = True
-    #         for player_num in action.log:
-    #             if action.log[player_num]["Waiting"] and action.log[player_num]["In hand"]:
-    #                 flag_done = False
-    #                 break
-    #         if flag_done:
-    #             end_turn = True
-    #             break
-    #
-    # # River action all around
-    # end_river = False
-    # for player in action.log.copy():
-    #     if not action.log[player]['In hand']:
-    #         action.remove_player(player)
-    # action.renew()
-    #
-    # # River stuff
-    # river = dealer.river()
-    # display_log(on_river=True)
-    #
-    # while not end_river:
-    #     for player in action.log:
-    #         print("Player " + str(player) + " Hand: " + str(temp_card_holder[player]))
-    #         buttons = options(player)
-    #         button = input(buttons)
-    #         if button == "FOLD":
-    #             action.add(player, action="FOLD", waiting=False, in_hand=False)
-    #         if button == "CHECK":
-    #             action.add(player, action="CHECK", waiting=False, in_hand=True)
-    #         if button == "CALL":
-    #             current_bet = action.current_bet()
-    #             action.add(player, action="CALL", bet=current_bet, waiting=False, in_hand=True,
-    #                        current_bet=current_bet)
-    #         if button == "RAISE":
-    #             raise_amt = input("Raise to: ")
-    #             action.add(player, action="RAISE", bet=float(raise_amt), waiting=False, in_hand=True,
-    #                        current_bet=float(raise_amt))
-    #             action.new_raise(player, raise_amt)
-    #         if button == "BET":
-    #             bet_amt = input("BET: ")
-    #             action.add(player, action="BET", bet=float(bet_amt), waiting=False, in_hand=True,
-    #                        current_bet=float(bet_amt))
-    #             action.new_bet(player)
-    #         display_log()
-    #         print("\n")
-    #
-    #         # Stop round if everyone's turn is finished
-    #         flag_done = True
-    #         for player_num in action.log:
-    #             if action.log[player_num]["Waiting"] and action.log[player_num]["In hand"]:
-    #                 flag_done = False
-    #                 break
-    #         if flag_done:
-    #             end_river = True
-    #             break
+        yield from self.next_street('flop')
+
+    def turn_steps(self):
+        self.turn_cards = self.dealer.turn()
+        yield from self.next_street('turn')
+
+    def river_steps(self):
+        self.river_cards = self.dealer.river()
+        yield from self.next_street('river')
+
+    def next_street(self, street):
+        """Plays a betting round on the newly dealt board"""
+        self.start_street(street, self.dealer.board)
+        yield from self.betting_steps(self.first_to_act(preflop=False))
+
+    def start_street(self, street, board):
+        """Collects the bets, clears folded players and moves on to a newly dealt board"""
+        self.collect()
+        for position in range(1, self.num_players + 1):
+            if position in self.action.log and not self.action.log[position]['In hand']:
+                self.action.remove_player(position)
+        self.action.renew()
+        self.min_raise = to_units(self.big_blind)
+        self.board = list(board)
+        self.emit(StreetChange, street, tuple(self.board))
+
+    def collect(self):
+        """Returns any uncalled part of the largest bet and moves the street's bets into the pot"""
+        refunded = self.chips.collect()
+        if refunded is not None:
+            self.action.set(refunded, "Stack", to_chips(self.chips.stacks[refunded - 1]))
+        for position in self.action.log:
+            self.action.set(position, "Bet", 0)
+        self.emit(PotUpdate, self.pot(), tuple(self.action.stacks))
+
+    def betting_round(self, first_position):
+        """Asks each player in turn for an action until every player still in the hand has acted"""
+        self.run(self.betting_steps(first_position))
+
+    def betting_steps(self, first_position):
+        """Yields each player in turn to act and carries out the action sent back, until every player still in the
+        hand has acted"""
+        log = self.action
+        position = first_position
+        while log.num_in_hand > 1 and log.num_waiting > 0:
+            index = position - 1
+            if log.seated[index] and log.in_hand[index] and log.waiting[index]:
+                if not self.pass_all_in(position):
+                    self.apply(position, (yield position))
+            position = position % self.num_players + 1
+
+    def pass_all_in(self, position):
+        """Marks a player with no decision to make as done acting and returns whether they had none
+
+        That is a player who is all in, or who has nothing to call when everyone else still in the hand is all in.
+        """
+        chips = self.chips
+        index = position - 1
+        if chips.stacks[index] <= 0 or chips.bets[index] == max(chips.bets) and not any(
+                chips.stacks[other] > 0 for other in range(self.num_players)
+                if other != index and self.action.in_hand[other] and self.action.seated[other]):
+            self.action.add(position, waiting=False)
+            return True
+        return False
+
+    def resolve(self, position, decision):
+        """Works out what an action string comes to for a player, without carrying it out
+
+        Raises and bets are brought up to the minimum raise, any bet or call a player cannot cover puts them all
+        in, and anything else they cannot do becomes a check or fold.
+
+        Returns:
+            The action ('FOLD', 'CHECK', 'CALL', 'BET', 'RAISE' or 'ALL IN') and the player's total bet after it
+        """
+        chips = self.chips
+        index = position - 1
+        words = decision.split() if decision else ["CHECK"]
+        move = words[0].upper()
+        highest_bet = max(chips.bets)
+        owed = highest_bet - chips.bets[index]
+        # The most the player can have in front of them on this street
+        total = chips.bets[index] + chips.stacks[index]
+
+        try:
+            amount = to_units(float(words[1])) if len(words) > 1 else 0
+        except ValueError:
+            amount = 0
+
+        if move in ("RAISE", "BET") and amount > 0 and highest_bet < total:
+            amount = min(max(amount, highest_bet + self.min_raise), total)
+            return "ALL IN" if amount >= total else "BET" if highest_bet == 0 else "RAISE", to_chips(amount)
+        elif move in ("CALL", "RAISE", "BET") and owed > 0:
+            amount = min(highest_bet, total)
+            return "ALL IN" if amount >= total else "CALL", to_chips(amount)
+        elif owed > 0:
+            return "FOLD", to_chips(chips.bets[index])
+        return "CHECK", to_chips(chips.bets[index])
+
+    def apply(self, position, decision):
+        """Carries out an action string for a player, as worked out by resolve"""
+        self.take_action(position, *self.resolve(position, decision))
+
+    def take_action(self, position, action, amount):
+        """Records a resolved action and its total bet in the log
+
+        Args:
+            position (int): The acting player's position
+            action (str): 'FOLD', 'CHECK', 'CALL', 'BET', 'RAISE' or 'ALL IN'
+            amount (float): The player's total bet on this street after the action
+        """
+        log = self.action
+        index = position - 1
+        highest_bet = max(self.chips.bets)
+        units = to_units(amount)
+
+        if action in ("BET", "RAISE") or action == "ALL IN" and units > highest_bet:
+            self.min_raise = max(self.min_raise, units - highest_bet)
+            self.bet(position, units, action=action, waiting=False, in_hand=True,
+                     note="ALL IN" if action == "ALL IN" else None)
+            if highest_bet == 0:
+                log.new_bet(position)
+            else:
+                log.new_raise(position, amount)
+        elif action in ("CALL", "ALL IN"):
+            self.bet(position, units, action=action, waiting=False, in_hand=True,
+                     note="ALL IN" if action == "ALL IN" else None)
+        elif action == "FOLD":
+            log.add(position, action="FOLD", waiting=False, in_hand=False)
+        else:
+            log.add(position, action="CHECK", waiting=False, in_hand=True)
+        # Every action passes through here, so skip working out the event's fields when nobody is listening
+        if self.subscribers:
+            self.emit(PlayerAction, position, action, log.bets[index], log.stacks[index], self.pot())
+
+    def showdown(self):
+        """Pays out the main pot and any side pots to the best hands eligible for them, or everything to the last
+        player left"""
+        self.collect()
+        players = [position for position in self.action.log if self.action.log[position]["In hand"]]
+        strengths = {}
+        if len(players) > 1:
+            self.board = self.dealer.run_out()
+            strengths = {position: evaluate(self.temp_card_holder[position] + self.board) for position in players}
+        pot = self.pot()
+        won = self.chips.award([position in players for position in range(1, self.num_players + 1)], strengths)
+        self.winners = sorted(won)
+        for position in self.winners:
+            self.action.set(position, "Stack", to_chips(self.chips.stacks[position - 1]))
+        shown = {position: tuple(self.temp_card_holder[position]) for position in strengths}
+        self.emit(Showdown, tuple(self.board), shown, tuple(self.winners), pot,
+                  tuple(to_chips(won[position]) for position in self.winners), tuple(self.action.stacks))
@@ -0,0 +1,202 @@
+from Setup import *
+from Events import *
+from Pot import to_units, to_chips
+import os
+import struct
+
+# Hand histories are stored as fixed-width binary records, one file per shard, each file starting with a short
+# header. Every event from Game becomes one record, apart from the per-seat parts of an event, which are written as
+# extra seat records just before it. Chips are stored as whole units, as Pot counts them:
+#
+#     kind        seat           code              cards          amount        stack         pot
+#     hand_start  num_players                                     small blind   big blind
+#     seat        position                                                      chips
+#     post_blind  position       0 (SB) or 1 (BB)                 amount        chips         pot
+#     deal        position                         hole cards
+#     action      position       action_codes                     bet           chips         pot
+#     street      0              street number     board
+#     pot_update  refunded seat                                                 its chips     pot
+#     show        position                         hole cards
+#     win         position                                        chips won     chips
+#     showdown    0                                board                                      pot
+#
+# Unused cards are no_card. A file of records can be memory-mapped as a whole with load_history for analytics, or
+# read back one hand at a time as events with read_hands.
+history_header = b'POKERHH3' + bytes(8)
+record_dtype = np.dtype([('hand', '<u4'), ('kind', 'u1'), ('seat', 'u1'), ('code', '<u2'), ('cards', 'u1', (5,)),
+                         ('amount', '<i8'), ('stack', '<i8'), ('pot', '<i8')])
+# The same layout for packing one record at a time
+record_struct = struct.Struct('<IBBH5sqqq')
+record_kinds = ['hand_start', 'seat', 'post_blind', 'deal', 'action', 'street', 'pot_update', 'show', 'showdown',
+                'win']
+kind_index = {kind: index for index, kind in enumerate(record_kinds)}
+hand_start_record, seat_record, post_blind_record, deal_record, action_record = (
+    kind_index['hand_start'], kind_index['seat'], kind_index['post_blind'], kind_index['deal'], kind_index['action'])
+street_record, pot_update_record, show_record, showdown_record, win_record = (
+    kind_index['street'], kind_index['pot_update'], kind_index['show'], kind_index['showdown'], kind_index['win'])
+action_codes = ['FOLD', 'CHECK', 'CALL', 'BET', 'RAISE', 'ALL IN']
+action_index = {action: index for index, action in enumerate(action_codes)}
+streets = ['preflop', 'flop', 'turn', 'river']
+street_index = {street: index for index, street in enumerate(streets)}
+no_card = 255
+_no_cards = bytes([no_card] * 5)
+
+
+def shard_path(directory, *shard):
+    """Returns the path of a history shard, e.g. shard_path('runs', 3, 1) is runs/hands-3-1.hh"""
+    return os.path.join(directory, 'hands-{}.hh'.format('-'.join(str(part) for part in shard)))
+
+
+def _padded(cards):
+    return bytes(cards) + _no_cards[len(cards):]
+
+
+class HistoryWriter:
+    """Appends the hands of a Game to a history file, as a subscriber to its events
+
+    Records are packed into a buffer as they arrive and written out in blocks.
+
+    Args:
+        path (str): The shard file, created with a header if it does not exist yet
+        buffer_size (int): Records held in memory before they are written out
+    """
+
+    def __init__(self, path, buffer_size=65536):
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(history_header)
+        self.buffer = bytearray()
+        self.buffer_bytes = buffer_size * record_struct.size
+        self.hand = 0
+
+    def handle(self, event):
+        kind = type(event)
+        buffer = self.buffer
+        pack = record_struct.pack
+        if kind is PlayerAction:
+            buffer += pack(self.hand, action_record, event.position, action_index[event.action], _no_cards,
+                           to_units(event.bet), to_units(event.stack), to_units(event.pot))
+        elif kind is Deal:
+            buffer += pack(self.hand, deal_record, event.position, 0, _padded(event.cards), 0, 0, 0)
+        elif kind is HandStart:
+            self.hand = event.hand
+            self.stacks = list(event.stacks)
+            for position, stack in enumerate(event.stacks, 1):
+                buffer += pack(self.hand, seat_record, position, 0, _no_cards, 0, to_units(stack), 0)
+            buffer += pack(self.hand, hand_start_record, event.num_players, 0, _no_cards, to_units(event.small_blind),
+                           to_units(event.big_blind), 0)
+        elif kind is PostBlind:
+            buffer += pack(self.hand, post_blind_record, event.position, 0 if event.blind == 'SB' else 1, _no_cards,
+                           to_units(event.amount), to_units(event.stack), to_units(event.pot))
+        elif kind is StreetChange:
+            buffer += pack(self.hand, street_record, 0, street_index[event.street], _padded(event.board), 0, 0, 0)
+        elif kind is PotUpdate:
+            # Only the bettor whose uncalled bet was returned, if any, has a stack that the actions do not give
+            refunded = [position for position, (stack, previous) in enumerate(zip(event.stacks, self.stacks), 1)
+                        if stack != previous]
+            buffer += pack(self.hand, pot_update_record, refunded[0] if refunded else 0, 0, _no_cards, 0,
+                           to_units(event.stacks[refunded[0] - 1]) if refunded else 0, to_units(event.pot))
+        elif kind is Showdown:
+            for position, cards in event.hands.items():
+                buffer += pack(self.hand, show_record, position, 0, _padded(cards), 0, 0, 0)
+            for position, won in zip(event.winners, event.won):
+                buffer += pack(self.hand, win_record, position, 0, _no_cards, to_units(won),
+                               to_units(event.stacks[position - 1]), 0)
+            buffer += pack(self.hand, showdown_record, 0, 0, _padded(event.board), 0, 0, to_units(event.pot))
+        if kind is PlayerAction or kind is PostBlind:
+            self.stacks[event.position - 1] = event.stack
+        elif kind is PotUpdate:
+            self.stacks = list(event.stacks)
+        if len(buffer) >= self.buffer_bytes:
+            self.flush()
+
+    def flush(self):
+        """Writes out the buffered records"""
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer = bytearray()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def load_history(path):
+    """Memory-maps every record in a history file as a structured array of record_dtype, with the chips in units"""
+    with open(path, 'rb') as file:
+        if file.read(len(history_header)) != history_header:
+            raise ValueError('{} is not a hand history file'.format(path))
+    if os.path.getsize(path) == len(history_header):
+        return np.zeros(0, dtype=record_dtype)
+    return np.memmap(path, dtype=record_dtype, mode='r', offset=len(history_header))
+
+
+def read_records(path, chunk_size=65536):
+    """Reads the records of a history file in chunks, holding one chunk in memory at a time
+
+    Yields:
+        Structured arrays of up to chunk_size records
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(history_header)) != history_header:
+            raise ValueError('{} is not a hand history file'.format(path))
+        while True:
+            chunk = np.fromfile(file, dtype=record_dtype, count=chunk_size)
+            if not len(chunk):
+                return
+            yield chunk
+
+
+def read_hands(path, chunk_size=65536):
+    """Reads a history file back into the events Game emitted, one hand at a time, with the chips converted back from
+    units
+
+    Args:
+        path (str): The shard file
+        chunk_size (int): Records read from the file at a time
+
+    Yields:
+        A list of events for each hand
+    """
+    hand, seats, shown, winners, stacks = [], [], {}, [], []
+    for chunk in read_records(path, chunk_size):
+        for number, kind, seat, code, cards, amount, stack, pot in chunk.tolist():
+            amount, stack, pot = to_chips(amount), to_chips(stack), to_chips(pot)
+            if kind == action_record:
+                stacks[seat - 1] = stack
+                hand.append(PlayerAction(seat, action_codes[code], amount, stack, pot))
+            elif kind == deal_record:
+                hand.append(Deal(seat, tuple(cards[:2])))
+            elif kind == seat_record:
+                seats.append(stack)
+            elif kind == hand_start_record:
+                stacks = seats
+                hand.append(HandStart(number, seat, amount, stack, tuple(seats)))
+                seats = []
+            elif kind == post_blind_record:
+                stacks[seat - 1] = stack
+                hand.append(PostBlind(seat, 'SB' if code == 0 else 'BB', amount, stack, pot))
+            elif kind == street_record:
+                hand.append(StreetChange(streets[code], tuple(card for card in cards if card != no_card)))
+            elif kind == pot_update_record:
+                if seat:
+                    stacks[seat - 1] = stack
+                hand.append(PotUpdate(pot, tuple(stacks)))
+            elif kind == show_record:
+                shown[seat] = tuple(cards[:2])
+            elif kind == win_record:
+                stacks[seat - 1] = stack
+                winners.append((seat, amount))
+            elif kind == showdown_record:
+                hand.append(Showdown(tuple(card for card in cards if card != no_card), shown,
+                                     tuple(position for position, won in winners), pot,
+                                     tuple(won for position, won in winners), tuple(stacks)))
+                yield hand
+                hand, shown, winners = [], {}, []
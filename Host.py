@@ -0,0 +1,179 @@
+from Setup import *
+from Game import *
+import json
+import asyncio
+import itertools
+
+
+class BotSeat:
+    """Plays a seat on a hosted table with a local agent
+
+    Args:
+        agent: An agent with an act(game, position) method, defaulting to a BotAgent
+    """
+
+    timeout = None
+
+    def __init__(self, agent=None):
+        self.agent = agent or BotAgent()
+
+    async def act(self, game, position):
+        return self.agent.act(game, position)
+
+    async def flush(self):
+        pass
+
+
+class StreamSeat:
+    """Plays a seat on a hosted table for a client connected over a stream, such as a TCP or Unix socket
+
+    The seat subscribes to the table's events and sends the client one line of JSON for each event it may see, as
+    written by event_record, leaving out the other players' hole cards. When the client is to act it is sent an
+    ActionRequest line, which it answers with a line holding an action string such as "Call" or "Raise 0.30", or a
+    JSON object {"request": <number>, "action": <action string>}. A client that does not answer in time, or answers
+    with a line that is not an action string or such an object, checks or folds, and later answers that give the
+    number of an earlier request are skipped.
+
+    Args:
+        reader (StreamReader): The client's stream
+        writer (StreamWriter): The client's stream
+        position (int): The client's seat
+        timeout (float): Seconds the client has for each action, or None to wait for as long as it takes
+    """
+
+    def __init__(self, reader, writer, position, timeout=30):
+        self.reader = reader
+        self.writer = writer
+        self.position = position
+        self.timeout = timeout
+        self.pending = []
+        self.requests = 0
+
+    def handle(self, event):
+        if type(event) is not Deal or event.position == self.position:
+            self.pending.append(event_record(event))
+
+    async def flush(self):
+        """Sends the events since the last flush, waiting while the client is behind on reading them"""
+        if self.pending:
+            self.writer.write(''.join(json.dumps(record, separators=(',', ':')) + '\n'
+                                      for record in self.pending).encode())
+            self.pending = []
+            # Only this client's table waits for it
+            await self.writer.drain()
+
+    async def act(self, game, position):
+        chips = game.chips
+        index = position - 1
+        self.requests += 1
+        self.pending.append({'event': 'ActionRequest', 'request': self.requests, 'position': position,
+                             'to_call': to_chips(max(chips.bets) - chips.bets[index]),
+                             'stack': to_chips(chips.stacks[index]), 'pot': to_chips(chips.total()),
+                             'options': game.options(position).rstrip(': ')})
+        await self.flush()
+        try:
+            return await asyncio.wait_for(self.answer(), self.timeout)
+        except asyncio.TimeoutError:
+            self.pending.append({'event': 'Timeout', 'request': self.requests})
+            return "Fold"
+
+    async def answer(self):
+        """Reads lines from the client until one answers the latest request"""
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError('Player {} disconnected'.format(self.position))
+            line = line.decode(errors='replace').strip()
+            if not line.startswith('{'):
+                return line
+            try:
+                reply = json.loads(line)
+            except ValueError:
+                return "Fold"
+            if not isinstance(reply, dict):
+                return "Fold"
+            if reply.get('request') == self.requests:
+                action = reply.get('action')
+                return action if isinstance(action, str) else "Fold"
+
+
+async def play_table(game, seats, num_hands=None, stack=None):
+    """Plays hands at a table as a coroutine, awaiting each action from the table's seats
+
+    Each action is awaited from a seat adapter such as a BotSeat or StreamSeat, and every stream seat is flushed
+    after each action, so a client that stops reading holds up only its own table.
+
+    Args:
+        game (Game): The table
+        seats (dict): A seat adapter for each position
+        num_hands (int): Number of hands to play, or None to play until a client disconnects
+        stack (float): Chips every seat is topped up to before each hand, or None to carry the stacks over
+
+    Returns:
+        How many chips each seat won or lost over all the hands
+    """
+    # In units, so that the totals of many hands come out exact
+    totals = [0] * game.num_players
+    adapters = list({id(seat): seat for seat in seats.values()}.values())
+    for _ in itertools.count() if num_hands is None else range(num_hands):
+        if stack is not None:
+            game.stacks = [stack] * game.num_players
+        steps = game.hand_steps()
+        try:
+            position = next(steps)
+            while True:
+                position = steps.send(await seats[position].act(game, position))
+                for seat in adapters:
+                    await seat.flush()
+        except StopIteration as stop:
+            totals = [total + to_units(result) for total, result in zip(totals, stop.value)]
+        for seat in adapters:
+            await seat.flush()
+        # Bots answer without waiting, so tables of bots let the others run between hands
+        await asyncio.sleep(0)
+    return [to_chips(total) for total in totals]
+
+
+async def serve(num_players=6, small_blind=0.05, big_blind=0.10, stack=10, seat=1, num_hands=None, host='127.0.0.1',
+                port=0, path=None, timeout=30, max_tables=256):
+    """Starts a server that gives each client that connects its own table of bots, all hosted in this process
+
+    Args:
+        num_players (int): Number of players at each table
+        small_blind (float): Value of small blind
+        big_blind (float): Value of big blind
+        stack (float): Chips every seat is topped up to before each hand
+        seat (int): The client's position at its table
+        num_hands (int): Number of hands each client plays, or None to play until it disconnects
+        host (str): Address to listen on over TCP
+        port (int): Port to listen on, 0 to pick a free one
+        path (str): Path of a Unix socket to listen on instead of TCP
+        timeout (float): Seconds a client has for each action
+        max_tables (int): Most tables played at once; clients beyond it wait for a table to finish
+
+    Returns:
+        An asyncio Server, already serving
+    """
+    tables = asyncio.Semaphore(max_tables)
+
+    async def connection(reader, writer):
+        async with tables:
+            game = Game(num_players, small_blind, big_blind, [stack] * num_players, output=None)
+            client = StreamSeat(reader, writer, seat, timeout)
+            game.subscribers.append(client)
+            seats = {position: BotSeat() for position in range(1, num_players + 1)}
+            seats[seat] = client
+            try:
+                await play_table(game, seats, num_hands, stack)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except ConnectionError:
+                    pass
+
+    if path is not None:
+        return await asyncio.start_unix_server(connection, path)
+    return await asyncio.start_server(connection, host, port)
@@ -1,21 +1,183 @@
 from Setup import *
+from Cache import *
+from Range import combo_cards, combo_masks
 import numpy as np
+import os
+import copy
+
+_missing = object()
+
+# Precomputed features of the 1,755 suit-isomorphic flops, regenerated with build_flop_textures
+postflop_data = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Postflop_Data')
+flop_texture_dtype = np.dtype([
+    ('cards', np.int8, 3),  # A representative flop, highest card first
+    ('ranks', np.int8, 3),  # Rank indices, highest first
+    ('pairing', np.int8),  # 0: unpaired, 1: paired, 2: trips
+    ('suits', np.int8),  # Number of suits - 1: monotone, 2: two-tone, 3: rainbow
+    ('connectedness', np.int8),  # Most flop ranks that fit in one straight
+    ('straights', np.int8),  # Number of two-rank holdings that make a straight
+    ('nut_category', np.int8),  # Category of the best possible hand, as in hand_categories
+    ('nut_strength', np.uint16),  # Strength of the best possible hand
+    ('combos', np.int8),  # Number of flops that share these features up to suits
+])
+
+
+def _flop_combination(flop):
+    """Returns the index (0-22099) of a set of three cards in combinatorial order"""
+    low, middle, high = sorted(flop)
+    return high * (high - 1) * (high - 2) // 6 + middle * (middle - 1) // 2 + low
+
+
+def flop_id(flop):
+    """Returns the canonical id (0-1754) shared by every suit-isomorphic version of a flop"""
+    return int(data_table(postflop_data, 'flop_ids')[_flop_combination(to_ints(flop))])
+
+
+def flop_texture(flop):
+    """Returns the precomputed features of a flop as a record of flop_texture_dtype"""
+    return data_table(postflop_data, 'flop_textures')[flop_id(flop)]
+
+
+def build_flop_textures():
+    """Regenerates the flop tables in Postflop_Data
+
+    Writes flop_ids.npy, the canonical id of each of the 22,100 flops in combinatorial order, and
+    flop_textures.npy, the features of each canonical flop.
+    """
+    ids = np.zeros(22100, dtype=np.int16)
+    representatives = {}
+    for flop in itertools.combinations(range(52), 3):
+        key = canonical_key((), flop)
+        representatives.setdefault(key, len(representatives))
+        ids[_flop_combination(flop)] = representatives[key]
+    textures = np.zeros(len(representatives), dtype=flop_texture_dtype)
+    textures['cards'] = list(representatives)
+    textures['combos'] = np.bincount(ids)
+    textures['ranks'] = textures['cards'] >> 2
+    textures['pairing'] = [3 - len(set(ranks)) for ranks in textures['ranks'].tolist()]
+    textures['suits'] = [len(set(card & 3 for card in cards)) for cards in textures['cards'].tolist()]
+    for texture in textures:
+        mask = rank_bits[texture['cards'][0]] | rank_bits[texture['cards'][1]] | rank_bits[texture['cards'][2]]
+        texture['connectedness'] = max(popcount[mask & window] for window in straight_windows)
+        texture['straights'] = sum(straight_highs[mask | 1 << rank1 | 1 << rank2] >= 0
+                                   for rank1, rank2 in itertools.combinations(range(13), 2))
+    # Best hand on each flop out of every holding that does not share a card with it
+    holdings = np.array(list(itertools.combinations(range(52), 2)), dtype=np.int8)
+    for index, texture in enumerate(textures):
+        cards = texture['cards']
+        possible = holdings[~np.isin(holdings, cards).any(axis=1)]
+        strengths, categories = evaluate_batch(np.hstack([possible, np.broadcast_to(cards, (len(possible), 3))]))
+        textures['nut_strength'][index] = strengths.max()
+        textures['nut_category'][index] = categories[strengths.argmax()]
+    os.makedirs(postflop_data, exist_ok=True)
+    np.save(os.path.join(postflop_data, 'flop_ids.npy'), ids)
+    np.save(os.path.join(postflop_data, 'flop_textures.npy'), textures)
+
+
+holding_dtype = np.dtype([
+    ('scenario', np.int8),  # Code returned by Postflop.flop_scenario, or -1 if the holding uses a flop card
+    ('category', np.int8),  # Made hand, as in hand_categories
+    ('strength', np.uint16),  # Strength of the made hand
+    ('straight_draw', np.int8),  # Straights one rank away - 0: none, 1: one (gutshot), 2: two or more
+    ('flush_draw', np.bool_),  # Four cards to a flush
+    ('pocket_pair', np.bool_),
+    ('pair', np.int8),  # For one pair, the number of flop ranks above the pair (0 for top pair or an overpair)
+])
+
+
+def classify_holdings(flop):
+    """Classifies every one of the 1326 holdings on a flop in one pass, as Postflop.flop_scenario would
+
+    Args:
+        flop (list): The three flop cards
+
+    Returns:
+        A structured array of holding_dtype indexed like Range.combo_cards
+    """
+    flop = to_ints(flop)
+    texture = flop_texture(flop)
+    flop_ranks = texture['ranks']
+    result = np.zeros(len(combo_cards), dtype=holding_dtype)
+    live = (combo_masks & cards_mask(flop)) == 0
+    cards = np.hstack([combo_cards, np.broadcast_to(np.array(flop, dtype=np.int8), (len(combo_cards), 3))])
+    strengths, categories = evaluate_batch(cards[live])
+    result['strength'][live] = strengths
+    result['category'][live] = categories
+
+    hole_ranks = combo_cards.astype(np.int64) >> 2
+    rank_masks = np.bitwise_or.reduce(1 << (cards.astype(np.int64) >> 2), axis=1)
+    windows = np.array(straight_windows)
+    draws = (np.array(popcount)[rank_masks[:, None] & windows] == 4).sum(axis=1)
+    result['straight_draw'] = np.minimum(draws, 2)
+    suit_counts = (cards[:, :, None] & 3) == np.arange(4)
+    result['flush_draw'] = (suit_counts.sum(axis=1) == 4).any(axis=1)
+    result['pocket_pair'] = hole_ranks[:, 0] == hole_ranks[:, 1]
+    # Rank of the pair made with a hole card, counted down from the top of the flop
+    pair_ranks = np.where(result['pocket_pair'], hole_ranks[:, 0],
+                          np.where(np.isin(hole_ranks[:, 0], flop_ranks), hole_ranks[:, 0], hole_ranks[:, 1]))
+    hole_pair = result['pocket_pair'] | np.isin(hole_ranks, flop_ranks).any(axis=1)
+    result['pair'] = np.where((result['category'] == 1) & hole_pair,
+                              (np.unique(flop_ranks)[:, None] > pair_ranks).sum(axis=0), -1)
+
+    # Five cards always use both hole cards, so the branches that need a single hole card never apply
+    category = result['category']
+    kickers = hole_ranks.sum(axis=1) - pair_ranks
+    has_ace = (hole_ranks == rank_values['A']).any(axis=1)
+    pair_scenario = np.select(
+        [result['pocket_pair'],
+         (texture['pairing'] == 0) & (pair_ranks == flop_ranks[2]),
+         texture['pairing'] == 0,
+         has_ace],
+        [15, 1, np.where(kickers >= rank_values['T'], 3, 12), 4], 0)
+    result['scenario'] = np.select(
+        [~live, category >= 6, category >= 2, draws >= 2, draws == 1, result['flush_draw'], category == 1],
+        [-1, 20, np.where(category == 3, 19, 18), 8, 2, 11, pair_scenario], 0)
+    return result
 
 
 class Postflop:
     """Used to assess postflop hand strength
 
     Args:
-        card_list (array): A list containing the hand dealt along with the cards on the board
+        card_list (array): A list containing the hand dealt along with the cards on the board. Cards may be
+            integers, Card objects or two-character strings
     """
 
     def __init__(self, card_list):
-        self.card_list = card_list
+        self.card_list = to_ints(card_list)
         self.num_cards = len(card_list)
-        self.hand_dealt = card_list[0:2]
-        self.flop = card_list[2:5]
-        self.turn = card_list[5]
-        self.river = card_list[6]
+        self.hand_dealt = self.card_list[0:2]
+        # Flop sorted from the highest card to the lowest
+        self.flop = sorted(self.card_list[2:5], reverse=True)
+        self.turn = self.card_list[5] if self.num_cards > 5 else None
+        self.river = self.card_list[6] if self.num_cards > 6 else None
+        # The flop_scenario code of the hand and the flop alone, kept once it is known
+        self.flop_code = None
+        self.analyzer = None
+
+    def deal(self, card):
+        """Adds the turn or river to the hand, so one Postflop can follow a hand from the flop to the river"""
+        card = to_int(card)
+        analyzer = self.street_analyzer()
+        self.card_list.append(card)
+        self.num_cards += 1
+        if self.num_cards == 6:
+            self.turn = card
+        else:
+            self.river = card
+        analyzer.add(card)
+
+    def street_analyzer(self):
+        """Returns the StreetAnalyzer for this hand, built from the flop the first time it is needed"""
+        if self.analyzer is None:
+            if self.flop_code is None:
+                self.flop_code = Postflop(self.card_list[0:5]).flop_scenario()
+            self.analyzer = StreetAnalyzer(self.card_list, self.flop_code)
+        return self.analyzer
+
+    def texture(self):
+        """Returns the precomputed features of the flop as a record of flop_texture_dtype"""
+        return flop_texture(self.flop)
 
     def flop_scenario(self):
         """Determines hand strength on the flop
@@ -64,15 +226,21 @@ class Postflop:
             - 6.5: Full house with both cards
             - 6.6: Quads/straight flush
         """
-        # Extract flop and sort
-        for i in range(3):
-            already_sorted = True
-            for j in range(2 - i):
-                if self.flop[j] > self.flop[j + 1]:
-                    self.flop[j], self.flop[j + 1] = self.flop[j + 1], self.flop[j]
-                already_sorted = False
-            if already_sorted:
-                break
+        result = self._cached('flop_scenario', self._flop_scenario)
+        if self.num_cards == 5:
+            self.flop_code = result
+        return result
+
+    def _cached(self, name, scenario):
+        """Looks up a scenario for a suit-isomorphic version of this spot before working it out"""
+        key = (name,) + canonical_key(self.hand_dealt, self.card_list[2:])
+        result = results_cache.get(key, _missing)
+        if result is _missing:
+            result = scenario()
+            results_cache.put(key, result)
+        return result
+
+    def _flop_scenario(self):
         current_hand = PokerHand(self.card_list)
         hand_rank = current_hand.classify_hand()
         best_five = current_hand.best_five
@@ -83,8 +251,9 @@ class Postflop:
             """Determines if both hole cards are utilized in the best five cards"""
             return set(self.hand_dealt).issubset(set(best_five))
 
-        flop_card_ranks = [self.flop[0][0], self.flop[1][0], self.flop[2][0]]
-        hand_card_ranks = [self.hand_dealt[0][0], self.hand_dealt[1][0]]
+        texture = self.texture()
+        flop_card_ranks = texture['ranks'].tolist()
+        hand_card_ranks = [self.hand_dealt[0] >> 2, self.hand_dealt[1] >> 2]
 
         # List of all applicable scenarios
         scenario = []
@@ -101,9 +270,9 @@ class Postflop:
             if not using_both_cards():
                 scenario.append(17)
             # Ace high on a tripped board
-            if len(np.unique(flop_card_ranks)) == 1:
+            if texture['pairing'] == 2:
                 for hand_rank in hand_card_ranks:
-                    if hand_rank == 'A':
+                    if hand_rank == rank_values['A']:
                         scenario.append(4)
         # Two pair
         elif hand_rank == 'Two pair':
@@ -124,7 +293,7 @@ class Postflop:
         elif f_draw and using_both_cards():
             scenario.append(11)
         # Flush draw with one card
-        elif s_draw and s_outs == 'Two' and not using_both_cards() and max(hand_card_ranks) in ['Q', 'K', 'A']:
+        elif s_draw and s_outs == 'Two' and not using_both_cards() and max(hand_card_ranks) >= rank_values['Q']:
             scenario.append(12)
         # Flush and straight draw
         elif s_draw and f_draw:
@@ -133,45 +302,45 @@ class Postflop:
         elif hand_rank == 'One pair':
             if len(np.unique(hand_card_ranks)) == 1:
                 # Overpair
-                if ranks.index(hand_card_ranks[0]) > ranks.index(flop_card_ranks[0]):
+                if hand_card_ranks[0] > flop_card_ranks[0]:
                     scenario.append(15)
                 # In between top and middle pair
-                if ranks.index(flop_card_ranks[0]) > ranks.index(hand_card_ranks[0]) > ranks.index(flop_card_ranks[1]):
+                if flop_card_ranks[0] > hand_card_ranks[0] > flop_card_ranks[1]:
                     scenario.append(15)
                 # In between middle and bottom pair
-                if ranks.index(flop_card_ranks[1]) > ranks.index(hand_card_ranks[0]) > ranks.index(flop_card_ranks[2]):
+                if flop_card_ranks[1] > hand_card_ranks[0] > flop_card_ranks[2]:
                     scenario.append(15)
                 # Below bottom pair
-                if ranks.index(flop_card_ranks[1]) < ranks.index(flop_card_ranks[2]):
+                if hand_card_ranks[0] < flop_card_ranks[2]:
                     scenario.append(15)
-            elif len(np.unique(flop_card_ranks)) == 3:
+            elif texture['pairing'] == 0:
                 for card_num, card in enumerate(self.hand_dealt):
                     # Top pair
-                    if card[0] == flop_card_ranks[0]:
+                    if card >> 2 == flop_card_ranks[0]:
                         if card_num == 0:
                             kicker_card = 1
                         else:
                             kicker_card = 0
                         # Good kicker
-                        if ranks.index(hand_card_ranks[kicker_card]) >= ranks.index('T'):
+                        if hand_card_ranks[kicker_card] >= rank_values['T']:
                             scenario.append(3)
                         # Meh kicker
                         else:
                             scenario.append(12)
                     # Middle pair
-                    if card[0] == flop_card_ranks[1]:
+                    if card >> 2 == flop_card_ranks[1]:
                         if card_num == 0:
                             kicker_card = 1
                         else:
                             kicker_card = 0
                         # Good kicker
-                        if ranks.index(hand_card_ranks[kicker_card]) >= ranks.index('T'):
+                        if hand_card_ranks[kicker_card] >= rank_values['T']:
                             scenario.append(3)
                         # Meh kicker
                         else:
                             scenario.append(12)
                     # Bottom pair
-                    if card[0] == flop_card_ranks[2]:
+                    if card >> 2 == flop_card_ranks[2]:
                         scenario.append(1)
                 # Pair and straight draw
                 if s_draw:
@@ -179,10 +348,10 @@ class Postflop:
                 # Pair and flush draw
                 if f_draw:
                     scenario.append(8)
-            elif len(np.unique(flop_card_ranks)) == 2:
+            elif texture['pairing'] == 1:
                 for hand_rank in hand_card_ranks:
                     # Ace high on a paired board
-                    if hand_rank == 'A':
+                    if hand_rank == rank_values['A']:
                         scenario.append(4)
             else:
                 # Paired board but nothing else
@@ -190,88 +359,132 @@ class Postflop:
         # Flopped nothing
         else:
             scenario.append(0)
-        return max(scenario)
+        # Paired board with no Ace
+        return max(scenario, default=0)
 
     def good_turn(self):
         """Determines hand strength on the turn
 
         Returns:
             An integer that represents a turn scenario
-            - 1: Bottom pair and lower, two overcards with King high, bottom pair + bfd or high kicker (J+)
-            - 2: Gutshot, gutshot + bfd
-            - 3: Paired/tripped board and Ace high
-            - 4: Ace high to the board low cards
-            - 5: Middle pair (eh kicker 10 below), Middle pair + bfd
-            - 6: Middle pair, good kicker (J+)
-            - 7: Open-ender with one card
-            - 8: Open-ender with two cards
-            - 9: Combo draw - pair and open-ender
-            - 10: Combo draw - pair and flush draw
-            - 11: Flush draw with two cards
-            - 12: A-high, K-high, or Q-high flush draw with one card
-            - 13: Top pair (9 and below)
-            - 14: Top pair (T and above) (call, XR 20%),
-            - okhkjhkjkjh open-ender + flush draw (call, XR 25%), between middle pair and top pair
-            - 15: Overpair (9 and below)
-            - 16: Overpair (T and above)
-            - 17: Trips
-            - 18: Straight, flush, two pair, set on a wet, connected flop
-            - 19: Set on a dry, unconnected flop
-            - 20: Full house, quads, straight flush
+            - 0: Nothing, or one pair that neither hole card makes with the flop
+            - 1: Gutshot, or bottom pair
+            - 2: Open-ender, or middle pair
+            - 3: Flush draw, or top pair
+            - 4: Two pair or better
         """
-        current_hand = PokerHand(self.card_list)
-        # Extract board and sort it
-        board = self.card_list[2:]
-        for i in range(4):
-            already_sorted = True
-            for j in range(3 - i):
-                if board[j] > board[j + 1]:
-                    board[j], board[j + 1] = board[j + 1], board[j]
-                already_sorted = False
-            if already_sorted:
-                break
-        hand_rank = current_hand.classify_hand()
-        best_five = current_hand.best_five
-        s_draw, s_outs = Draw(self.card_list).straight_draw()
-        f_draw, f_suit = Draw(self.card_list).flush_draw()
-        if hand_rank in hand_ranks[1:]:
+        return self._cached('good_turn', self._good_turn)
+
+    def _good_turn(self):
+        return self.street_analyzer().turn_scenario()
+
+    def good_river(self):
+        """Determines hand strength on the river
+
+        Returns:
+            4 for two pair or better, otherwise 0
+        """
+        return self._cached('good_river', self._good_river)
+
+    def _good_river(self):
+        return self.street_analyzer().river_scenario()
+
+
+class StreetAnalyzer:
+    """Follows one hand from the flop to the river, carrying the flop analysis forward as the turn and river come
+
+    Each new card only updates running totals (packed evaluator key, card bits, rank mask and suit counts), so the
+    turn and river are scored without re-evaluating the hand or re-running the draw detectors from scratch.
+
+    Args:
+        card_list (list): The hand dealt and the flop, optionally followed by the turn and river
+        flop_scenario (int): The code Postflop.flop_scenario gives for the flop, if it is already known
+
+    Attributes:
+        texture (record): The precomputed features of the flop
+        flop_scenario (int): The code returned by Postflop.flop_scenario for the flop
+        strength (int): The strength of the current hand
+        category (int): The index into hand_categories of the current hand
+    """
+
+    def __init__(self, card_list, flop_scenario=None):
+        card_list = to_ints(card_list)
+        self.hand_dealt = card_list[0:2]
+        self.board = card_list[2:5]
+        self.num_cards = 0
+        self.key = 0
+        self.bits = 0
+        self.rank_mask = 0
+        self.suit_counts = [0] * 4
+        for card in card_list[0:5]:
+            self._update(card)
+        self.texture = flop_texture(self.board)
+        if flop_scenario is None:
+            flop_scenario = Postflop(card_list[0:5]).flop_scenario()
+        self.flop_scenario = flop_scenario
+        # Which flop card a hole card pairs (3 for the top card down to 1 for the bottom, 0 for none), fixed once
+        # the flop is out
+        self.flop_pair = 0
+        if self.texture['pairing'] == 0:
+            flop_ranks = self.texture['ranks'].tolist()
+            for card in self.hand_dealt:
+                if card >> 2 in flop_ranks:
+                    self.flop_pair = 3 - flop_ranks.index(card >> 2)
+                    break
+        self.strength = evaluate_key(self.key, self.bits, 5)
+        self.category = hand_category(self.strength)
+        for card in card_list[5:]:
+            self.add(card)
+
+    def _update(self, card):
+        self.num_cards += 1
+        self.key += card_keys[card]
+        self.bits |= card_bits[card]
+        self.rank_mask |= rank_bits[card]
+        self.suit_counts[card & 3] += 1
+
+    def copy(self):
+        """Returns an independent analyzer in the same state, e.g. to try several turn cards from one flop"""
+        other = copy.copy(self)
+        other.board = list(self.board)
+        other.suit_counts = list(self.suit_counts)
+        return other
+
+    def add(self, card):
+        """Deals the turn or river and returns the scenario for the new street"""
+        card = to_int(card)
+        self.board.append(card)
+        self._update(card)
+        self.strength = evaluate_key(self.key, self.bits, self.num_cards)
+        self.category = hand_category(self.strength)
+        return self.turn_scenario() if self.num_cards == 6 else self.river_scenario()
+
+    def straight_draws(self):
+        """Returns the number of straights that are one rank away"""
+        return sum(popcount[self.rank_mask & window] == 4 for window in straight_windows)
+
+    def flush_draw(self):
+        return 4 in self.suit_counts
+
+    def turn_scenario(self):
+        """Returns the code that Postflop.good_turn gives for the current cards"""
+        if self.category >= 2:
             return 4
-        elif f_draw:
+        elif self.flush_draw():
             return 3
-        elif hand_rank == 'One pair':
-            if len(np.unique([self.flop[0][0], self.flop[1][0], self.flop[2][0]])) == 3:
-                for card in self.hand_dealt:
-                    # Top, middle, or bottom pair
-                    if card[0] == self.flop[0][0]:
-                        return 3
-                    if card[0] == self.flop[1][0]:
-                        return 2
-                    if card[0] == self.flop[2][0]:
-                        return 1
-            else:
-                return 0
-        elif s_draw and s_outs == 'Two':
+        elif self.category == 1:
+            if self.texture['pairing'] == 0:
+                return self.flop_pair
+            return 0
+        draws = self.straight_draws()
+        if draws >= 2:
             return 2
-        elif s_draw and s_outs == 'One':
+        elif draws == 1:
             return 1
-        else:
-            return 0
+        return 0
 
-    def good_river(self):
-        current_hand = PokerHand(self.card_list)
-        # Extract board and sort it
-        board = self.card_list[2:]
-        for i in range(5):
-            already_sorted = True
-            for j in range(4 - i):
-                if board[j] > board[j + 1]:
-                    board[j], board[j + 1] = board[j + 1], board[j]
-                already_sorted = False
-            if already_sorted:
-                break
-        hand_rank = current_hand.classify_hand()
-        best_five = current_hand.best_five
-        if hand_rank in hand_ranks[1:]:
+    def river_scenario(self):
+        """Returns the code that Postflop.good_river gives for the current cards"""
+        if self.category >= 2:
             return 4
-        else:
-            return 0
\ No newline at end of file
+        return 0
@@ -0,0 +1,139 @@
+from Setup import *
+
+# Chips are counted in whole units of the smallest bet size, so sums of chips never drift the way sums of floats do
+units_per_chip = 100
+
+
+def to_units(chips):
+    """Returns an amount of chips, such as 0.35, as a whole number of units"""
+    return int(round(chips * units_per_chip))
+
+
+def to_chips(units):
+    """Returns a whole number of units as an amount of chips"""
+    return units / units_per_chip
+
+
+def side_pots(contributions, in_hand):
+    """Splits the chips put in over a hand into the main pot and side pots
+
+    Each player still in the hand caps a pot at the amount they put in, so a player who went all in for less only
+    competes for the chips matched against their own. Chips from players who folded count towards the pots they
+    reached. Seats are sorted once by contribution and every pot is built in the same pass.
+
+    Args:
+        contributions (list): Units each seat put in over the hand
+        in_hand (list): Whether each seat is still in the hand
+
+    Returns:
+        A list of the units in each pot and the positions that can win it, from the main pot out
+    """
+    order = sorted(range(len(contributions)), key=contributions.__getitem__)
+    pots = []
+    level = 0
+    # Chips above the last level from seats that have already been passed
+    passed = 0
+    for rank, seat in enumerate(order):
+        contribution = contributions[seat]
+        if in_hand[seat] and contribution > level:
+            # Every seat from here on put in at least as much as this one
+            amount = passed + (len(order) - rank) * (contribution - level)
+            pots.append([amount, sorted(other + 1 for other in order[rank:] if in_hand[other])])
+            level = contribution
+            passed = 0
+        else:
+            passed += max(contribution - level, 0)
+    if passed and pots:
+        pots[-1][0] += passed
+    return [tuple(pot) for pot in pots]
+
+
+def award_pots(pots, strengths):
+    """Splits each pot evenly between the players eligible for it with the best hand
+
+    Units that do not split evenly go one each to the winners in the earliest seats.
+
+    Args:
+        pots (list): The pots from side_pots
+        strengths (dict): The strength of each player's hand, as returned by evaluate, keyed by position. Only needed
+            for pots with more than one eligible player
+
+    Returns:
+        A Counter of the units each position won
+    """
+    won = collections.Counter()
+    for amount, eligible in pots:
+        if len(eligible) == 1:
+            winners = eligible
+        else:
+            best = max(strengths[position] for position in eligible)
+            winners = [position for position in eligible if strengths[position] == best]
+        share, odd = divmod(amount, len(winners))
+        for rank, position in enumerate(winners):
+            won[position] += share + (rank < odd)
+    return won
+
+
+class Pot:
+    """Keeps the chips of one hand in whole units, from the blinds to the award of the main and side pots
+
+    Args:
+        stacks (list): Each seat's chips at the start of the hand, in units
+
+    Attributes:
+        stacks (list): Units each seat has behind
+        bets (list): Units each seat has bet on the current street
+        contributions (list): Units each seat has put in over the hand, including the current street
+        collected (int): Units collected into the pot on earlier streets
+    """
+
+    __slots__ = ('stacks', 'bets', 'contributions', 'collected')
+
+    def __init__(self, stacks):
+        self.stacks = list(stacks)
+        self.bets = [0] * len(stacks)
+        self.contributions = [0] * len(stacks)
+        self.collected = 0
+
+    def total(self):
+        """Returns the units in the pot, including bets on the current street"""
+        return self.collected + sum(self.bets)
+
+    def bet(self, position, total):
+        """Brings a player's bet on this street to a total, moving the difference from their stack"""
+        index = position - 1
+        difference = total - self.bets[index]
+        self.stacks[index] -= difference
+        self.contributions[index] += difference
+        self.bets[index] = total
+
+    def collect(self):
+        """Returns the uncalled part of the largest bet and moves the street's bets into the pot
+
+        Returns:
+            The position whose bet was partly returned, or None
+        """
+        bets = sorted(self.bets, reverse=True)
+        refunded = None
+        if len(bets) > 1 and bets[0] > bets[1]:
+            refunded = self.bets.index(bets[0]) + 1
+            self.bet(refunded, bets[1])
+        self.collected += sum(self.bets)
+        self.bets = [0] * len(self.bets)
+        return refunded
+
+    def award(self, in_hand, strengths):
+        """Builds the main and side pots and pays them out to the best hands eligible for each
+
+        Args:
+            in_hand (list): Whether each seat is still in the hand
+            strengths (dict): The strength of each player's hand, keyed by position, for pots that are contested
+
+        Returns:
+            A Counter of the units each position won
+        """
+        won = award_pots(side_pots(self.contributions, in_hand), strengths)
+        for position, units in won.items():
+            self.stacks[position - 1] += units
+        self.collected = 0
+        return won
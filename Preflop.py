@@ -1,12 +1,109 @@
 from Setup import *
+from Equity import monte_carlo_equity
+import os
+import multiprocessing
+
+# Precomputed all-in equities of the 169 starting hand classes, regenerated with build_equity_tables
+preflop_data = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Preflop_Data')
+
+
+def equity_vs_hand(hand, opponent_hand):
+    """Returns the preflop all-in equity of a hand's class against another hand's class
+
+    Args:
+        hand (list): The two hole cards
+        opponent_hand (list): The opponent's two hole cards
+    """
+    return float(data_table(preflop_data, 'equity_169')[hand_class(*hand), hand_class(*opponent_hand)])
+
+
+def equity_vs_random(hand, num_opponents=1):
+    """Returns the preflop all-in equity of a hand's class against 1 to 8 random hands"""
+    return float(data_table(preflop_data, 'equity_vs_random')[hand_class(*hand), num_opponents - 1])
+
+
+def _equity_row(row, trials, random_trials, seed):
+    """Simulates one class against every class from its own onwards and against 1 to 8 random hands"""
+    hand = class_combos[row][0]
+    versus = np.zeros(169)
+    for column in range(row, 169):
+        combos = [combo for combo in class_combos[column] if not set(combo) & set(hand)]
+        versus[column] = monte_carlo_equity(hand, [combos], trials=trials, processes=1,
+                                            seed=[seed, row, column]).equity
+    random_hands = [monte_carlo_equity(hand, num_opponents, trials=random_trials, processes=1,
+                                       seed=[seed, row, 169 + num_opponents]).equity
+                    for num_opponents in range(1, 9)]
+    return versus, random_hands
+
+
+def build_equity_tables(trials=4000, random_trials=20000, processes=None, seed=0):
+    """Regenerates the preflop equity tables in Preflop_Data
+
+    Writes equity_169.npy, the equity of each class (rows) against each class (columns), and
+    equity_vs_random.npy, the equity of each class against 1 to 8 random hands (columns 0 to 7).
+    Suits are symmetric, so each row deals one hand of its class against every hand of the opposing class.
+
+    Args:
+        trials (int): Runouts per class matchup
+        random_trials (int): Runouts per class and number of random opponents
+        processes (int): Number of worker processes, defaulting to the number of cores
+        seed (int): Seed for the random streams
+    """
+    tasks = [(row, trials, random_trials, seed) for row in range(169)]
+    with multiprocessing.Pool(pool_size(processes, len(tasks))) as pool:
+        rows = pool.starmap(_equity_row, tasks)
+    versus = np.array([row for row, random_hands in rows])
+    versus = np.triu(versus) + np.tril(1 - versus.T, -1)
+    os.makedirs(preflop_data, exist_ok=True)
+    np.save(os.path.join(preflop_data, 'equity_169.npy'), versus.astype(np.float32))
+    np.save(os.path.join(preflop_data, 'equity_vs_random.npy'),
+            np.array([random_hands for row, random_hands in rows], dtype=np.float32))
+
+
+# Rows of the compiled rule tables
+positions = ['small', 'big', 'early', 'middle', 'late']
+decisions = ['open', 'raise', 'three_bet', 'four_bet']
+position_index = {position: index for index, position in enumerate(positions)}
+decision_index = {decision: index for index, decision in enumerate(decisions)}
+# Each entry is an action, the action taken instead, and how often the first one is taken
+rule_dtype = np.dtype([('action', np.int8), ('alternative', np.int8), ('probability', np.float32)])
+_rule_table = None
+
+
+def compile_rules():
+    """Evaluates the Preflop rules once for every decision, position and starting hand class
+
+    Returns:
+        A structured array of rule_dtype indexed by decision, position and class (4 x 5 x 169)
+    """
+    global _rule_table
+    table = np.zeros((len(decisions), len(positions), 169), dtype=rule_dtype)
+    for position in positions:
+        for index, (card1, card2) in enumerate(combo[0] for combo in class_combos):
+            hand = Preflop(card1, card2, position)
+            rules = [(1, 0, hand._playable_rule() or 0), hand._facing_raise_rule(), hand._facing_three_bet_rule(),
+                     hand._facing_four_bet_rule()]
+            for decision, (action, alternative, probability) in enumerate(rules):
+                # Rules that never or always take the action are stored as a single certain action
+                if probability <= 0 or probability >= 1:
+                    action = alternative = action if probability >= 1 else alternative
+                    probability = 1
+                table[decision, position_index[position], index] = action, alternative, probability
+    _rule_table = table
+    return table
+
+
+def rule_table():
+    """Returns the compiled rule tables, compiling them the first time they are needed"""
+    return _rule_table if _rule_table is not None else compile_rules()
 
 
 class Preflop:
     """Used to assess preflop strength
 
     Args:
-        card1 (str): A two-character string that contains the rank and suit of the first card
-        card2 (str): A two-character string that contains the rank and suit of the second card
+        card1 (int): The first card, as an integer, a Card or a two-character string such as 'Ah'
+        card2 (int): The second card, as an integer, a Card or a two-character string such as 'Ah'
         position (str): One of the following strings that denotes position
             E.g. with a 9-handed table
             - "small": 1
@@ -14,18 +111,28 @@ class Preflop:
             - "early": 3, 4
             - "middle": 5, 6, 7
             - "late": 8, 9
+        rules (array): Compiled rule tables to use instead of the built-in rules, e.g. the rules of a Profile
 
     Ranges: http://www.pokerhandrange.com/hand/3ses9pq7wg0rj45r998ase7en
     """
 
-    def __init__(self, card1, card2, position):
-        self.card1 = card1
-        self.card2 = card2
-        self.rank1 = card1[0]
-        self.rank2 = card2[0]
-        self.suit1 = card1[1]
-        self.suit2 = card2[1]
+    def __init__(self, card1, card2, position, rules=None):
+        self.card1 = to_int(card1)
+        self.card2 = to_int(card2)
+        self.index1 = self.card1 >> 2
+        self.index2 = self.card2 >> 2
+        self.rank1 = ranks[self.index1]
+        self.rank2 = ranks[self.index2]
+        self.suit1 = self.card1 & 3
+        self.suit2 = self.card2 & 3
         self.position = position
+        self.position_index = position_index.get(position)
+        self.hand_class = hand_class(self.card1, self.card2)
+        self.rules = rules
+
+    def equity(self, num_opponents=1):
+        """Returns the precomputed all-in equity of the hand against 1 to 8 random hands"""
+        return equity_vs_random([self.card1, self.card2], num_opponents)
 
     def suited(self):
         if self.suit1 == self.suit2:
@@ -40,16 +147,14 @@ class Preflop:
             return False
 
     def connector(self):
-        return any((ranks[i], ranks[i + 1]) == (self.rank1, self.rank2)
-                   or (ranks[i + 1], ranks[i]) == (self.rank1, self.rank2)
-                   or (ranks[0], ranks[-1]) == (self.rank1, self.rank2)
-                   or (ranks[-1], ranks[0]) == (self.rank1, self.rank2) for i in range(len(ranks) - 1))
+        # Adjacent ranks, with A2 counting as a connector
+        gap = abs(self.index1 - self.index2)
+        return gap == 1 or gap == 12
 
     def one_gapper(self):
-        return any((ranks[i], ranks[i + 2]) == (self.rank1, self.rank2)
-                   or (ranks[i + 2], ranks[i]) == (self.rank1, self.rank2)
-                   or (ranks[1], ranks[-1]) == (self.rank1, self.rank2)
-                   or (ranks[-1], ranks[1]) == (self.rank1, self.rank2) for i in range(len(ranks) - 2))
+        # Ranks two apart, with A3 counting as a one-gapper
+        gap = abs(self.index1 - self.index2)
+        return gap == 2 or gap == 11
 
     def broadways(self):
         if self.rank1 in premium and self.rank2 in premium:
@@ -57,152 +162,193 @@ class Preflop:
         else:
             return False
 
+    def decide(self, decision):
+        """Looks up the compiled rules for this hand and position, choosing between mixed actions at random
+
+        Args:
+            decision (str): One of the names in decisions
+
+        Returns:
+            An integer action as described by the method for that decision
+        """
+        if self.position_index is None:
+            raise NameError('Invalid position name')
+        rules = self.rules if self.rules is not None else rule_table()
+        action, alternative, probability = rules[decision_index[decision], self.position_index,
+                                                 self.hand_class].item()
+        if probability >= 1 or random.uniform(0, 1) < probability:
+            return action
+        return alternative
+
     def playable(self):
         """Determines if a hand is playable, accounting for position
 
         Returns:
             A boolean value
         """
+        return self.decide('open') == 1
+
+    def facing_raise(self):
+        """Suggests an action when facing a raise
+
+        Returns:
+            An integer that represents varying degrees of action
+            - 0: Fold
+            - 1: Flat the raise
+            - 2: Three-bet if optimal, but flat if good odds (drawing hands)
+            - 3: Three-bet no matter what
+        """
+        return self.decide('raise')
+
+    def facing_three_bet(self):
+        """Suggests an action when facing a three-bet
+
+        Returns:
+            An integer that represents varying degrees of action
+            - 0: Fold
+            - 1: Flat
+            - 2: Four-bet
+        """
+        return self.decide('three_bet')
+
+    def facing_four_bet(self):
+        """Suggests an action when facing a four-bet
+
+        Returns:
+            An integer that represents varying degrees of action
+            - 0: Fold
+            - 1: Flat and play cautiously (JJ/QQ/AK)
+            - 2: Five-bet or flat/jam flop/three-barrel (AA/KK)
+        """
+        return self.decide('four_bet')
+
+    def _playable_rule(self):
+        """Determines how often a hand is playable, accounting for position
+
+        Returns:
+            The probability of playing the hand
+        """
         if self.position == 'early' or self.position == 'small':
             # 77+
-            if self.pockets() and ranks.index(self.rank1) >= 5:
-                return True
+            if self.pockets() and self.index1 >= 5:
+                return 1
             # Suited broadways
             elif self.broadways() and self.suited():
-                return True
+                return 1
             # AKo, AQo, AJo, KQo
-            elif ranks.index(self.rank1) + ranks.index(self.rank2) >= 21:
-                return True
+            elif self.index1 + self.index2 >= 21:
+                return 1
             #  A5s, T9s
             elif self.rank1 + self.rank2 in ['A5', '5A', 'T9', '9T'] and self.suited():
-                if random.uniform(0, 1) >= 0.75:
-                    return True
+                return 0.25
             # Set mining if small blind
             elif self.pockets() and self.position == 'small':
-                return True
+                return 1
             else:
-                return False
+                return 0
 
         elif self.position == 'middle' or self.position == 'big':
             # 55+
-            if self.pockets() and ranks.index(self.rank1) >= 3:
-                return True
+            if self.pockets() and self.index1 >= 3:
+                return 1
             # K8s+, Q9s+
-            elif ranks.index(self.rank1) + ranks.index(self.rank2) >= 17 and self.suited():
-                return True
+            elif self.index1 + self.index2 >= 17 and self.suited():
+                return 1
             # A2s+
-            elif (ranks.index(self.rank1) == 12 or ranks.index(self.rank2) == 12) and self.suited():
-                return True
+            elif (self.index1 == 12 or self.index2 == 12) and self.suited():
+                return 1
             # TJs, 9Ts, 89s, 78s, 67s
             elif self.connector() and self.suited():
-                if ranks.index(self.rank1) + ranks.index(self.rank2) >= 9:
-                    return True
+                if self.index1 + self.index2 >= 9:
+                    return 1
             # J9s, T8s
             elif self.one_gapper() and self.suited():
-                if ranks.index(self.rank1) + ranks.index(self.rank2) >= 14:
-                    return True
+                if self.index1 + self.index2 >= 14:
+                    return 1
             # AKo, AQo, AJo, KQo, KJo
-            elif ranks.index(self.rank1) + ranks.index(self.rank2) >= 20:
+            elif self.index1 + self.index2 >= 20:
                 if self.rank1 + self.rank2 not in ['AT', 'TA']:
-                    return True
+                    return 1
             # Set mining if big blind
             elif self.pockets() and self.position == 'big':
-                return True
+                return 1
             else:
-                return False
+                return 0
 
         elif self.position == 'late':
             # 22+
             if self.pockets():
-                return True
+                return 1
             # K8s+, Q8s+, J8s+, T8s+
             elif self.rank1 in premium and self.suited:
-                if ranks.index(self.rank2) >= 6:
-                    return True
+                if self.index2 >= 6:
+                    return 1
             elif self.rank2 in premium and self.suited:
-                if ranks.index(self.rank1) >= 6:
-                    return True
+                if self.index1 >= 6:
+                    return 1
             # A2s+
-            elif (ranks.index(self.rank1) == 12 or ranks.index(self.rank2) == 12) and self.suited():
-                return True
+            elif (self.index1 == 12 or self.index2 == 12) and self.suited():
+                return 1
             # 89s, 78s, 67s, 56s, 45s
             elif self.connector() and self.suited():
-                if ranks.index(self.rank1) + ranks.index(self.rank2) >= 5:
-                    return True
+                if self.index1 + self.index2 >= 5:
+                    return 1
             # 68s, 79s
             elif self.one_gapper() and self.suited():
-                if ranks.index(self.rank1) + ranks.index(self.rank2) >= 10:
-                    return True
+                if self.index1 + self.index2 >= 10:
+                    return 1
             else:
-                return False
+                return 0
 
         else:
             raise NameError('Invalid position name')
 
-    def facing_raise(self):
+    def _facing_raise_rule(self):
         """Suggests an action when facing a raise
 
         Returns:
-            An integer that represents varying degrees of action
-            - 0: Fold
-            - 1: Flat the raise
-            - 2: Three-bet if optimal, but flat if good odds (drawing hands)
-            - 3: Three-bet no matter what
+            The action, the alternative action, and the probability of taking the action rather than the alternative
         """
         if self.rank1 + self.rank2 in ['AA', 'KK', 'QQ', 'AK', 'KA', 'JJ']:
-            return 3
+            return 3, 3, 1
         elif self.rank1 + self.rank2 in ['TT', '99', 'AQ', 'QA', 'KQ', 'QK', 'AJ', 'JA']:
             if self.rank1 + self.rank2 in ['KQ', 'QK', 'AJ', 'JA']:
                 if self.suited():
-                    return 2
+                    return 2, 2, 1
                 else:
-                    return 1
+                    return 1, 1, 1
             else:
-                return 2
-        elif self.playable():
-            return 1
+                return 2, 2, 1
         else:
-            return 0
+            return 1, 0, self._playable_rule() or 0
 
-    def facing_three_bet(self):
+    def _facing_three_bet_rule(self):
         """Suggests an action when facing a three-bet
 
         Returns:
-            An integer that represents varying degrees of action
-            - 0: Fold
-            - 1: Flat
-            - 2: Four-bet
+            The action, the alternative action, and the probability of taking the action rather than the alternative
         """
         if self.rank1 + self.rank2 in ['AA', 'KK', 'QQ']:
-            return 2
+            return 2, 2, 1
         elif self.rank1 + self.rank2 == 'AK':
             if self.suited():
-                if random.uniform(0, 1) >= 0.9:
-                    return 2
-                else:
-                    return 1
+                return 2, 1, 0.1
             else:
-                if random.uniform(0, 1) >= 0.75:
-                    return 2
-                else:
-                    return 1
-        elif self.facing_raise() >= 2:
-            return 1
+                return 2, 1, 0.25
+        elif self._facing_raise_rule()[1] >= 2:
+            return 1, 1, 1
         else:
-            return False
+            return 0, 0, 1
 
-    def facing_four_bet(self):
+    def _facing_four_bet_rule(self):
         """Suggests an action when facing a four-bet
 
         Returns:
-            An integer that represents varying degrees of action
-            - 0: Fold
-            - 1: Flat and play cautiously (JJ/QQ/AK)
-            - 2: Five-bet or flat/jam flop/three-barrel (AA/KK)
+            The action, the alternative action, and the probability of taking the action rather than the alternative
         """
         if self.rank1 + self.rank2 in ['QQ', 'AK', 'KA', 'JJ']:
-            return 1
+            return 1, 1, 1
         elif self.rank1 + self.rank2 in ['AA', 'KK']:
-            return 2
+            return 2, 2, 1
         else:
-            return 0
+            return 0, 0, 1
@@ -0,0 +1,131 @@
+from Setup import *
+import re
+
+# Every two-card combination, higher card first, in a fixed order shared by all ranges
+combo_cards = np.array(list(itertools.combinations(range(51, -1, -1), 2)), dtype=np.int8)
+combo_masks = card_bits_array[combo_cards[:, 0]] | card_bits_array[combo_cards[:, 1]]
+combo_classes = np.array([hand_class(card1, card2) for card1, card2 in combo_cards.tolist()], dtype=np.int16)
+# Index of the combination of any two different cards, in either order
+combo_index = np.full((52, 52), -1, dtype=np.int16)
+combo_index[combo_cards[:, 0], combo_cards[:, 1]] = np.arange(len(combo_cards))
+combo_index[combo_cards[:, 1], combo_cards[:, 0]] = np.arange(len(combo_cards))
+
+_token = re.compile(r'^([2-9TJQKA])([2-9TJQKA])([so]?)(\+?)(?:-([2-9TJQKA])([2-9TJQKA])\3)?$')
+_specific = re.compile(r'^([2-9TJQKA][hdsc])([2-9TJQKA][hdsc])$')
+
+
+def _class_indices(high, low, suitedness):
+    """Lists the class indices of two ranks, covering both suited and unsuited hands unless one is given"""
+    if high == low:
+        return [13 * high + high]
+    high, low = max(high, low), min(high, low)
+    return [index for kind, index in [('s', 13 * high + low), ('o', 13 * low + high)] if suitedness in ('', kind)]
+
+
+def _parse_token(token):
+    """Returns the class indices of one range token such as 'AA', '77+', 'ATs+', 'KQo' or '22-55'"""
+    match = _token.match(token)
+    if match is None:
+        raise ValueError('Invalid hand range notation: {}'.format(token))
+    first, second, suitedness, plus, end_first, end_second = match.groups()
+    high, low = rank_values[first], rank_values[second]
+    if high < low:
+        high, low = low, high
+    if plus or end_first:
+        if high == low:
+            top = rank_values[end_first] if end_first else 12
+            return [index for rank in range(min(high, top), max(high, top) + 1)
+                    for index in _class_indices(rank, rank, '')]
+        top = rank_values[end_second] if end_first else high - 1
+        return [index for kicker in range(min(low, top), max(low, top) + 1)
+                for index in _class_indices(high, kicker, suitedness)]
+    return _class_indices(high, low, suitedness)
+
+
+class Range:
+    """A weighted range of starting hands, stored as one weight for each of the 1326 two-card combinations
+
+    Args:
+        notation (str or list): Hands in range notation separated by commas, e.g. "77+, ATs+, KQo, A2s-A5s, AhKh".
+            A token may end in a weight, as in "AKo:0.5". A list of tokens works too
+        weights (array): The 1326 combination weights, used instead of notation
+
+    Attributes:
+        weights (array): The weight (0-1) of each combination, indexed like combo_cards
+    """
+
+    __slots__ = ('weights',)
+
+    def __init__(self, notation=None, weights=None):
+        if weights is not None:
+            self.weights = np.asarray(weights, dtype=np.float64)
+            return
+        self.weights = np.zeros(len(combo_cards))
+        if notation is None:
+            return
+        tokens = notation.split(',') if isinstance(notation, str) else notation
+        class_weights = np.zeros(169)
+        for token in tokens:
+            token, weight = token.strip(), 1.0
+            if not token:
+                continue
+            if ':' in token:
+                token, weight = token.split(':')
+                weight = float(weight)
+            specific = _specific.match(token)
+            if specific:
+                self.weights[combo_index[card_values[specific.group(1)], card_values[specific.group(2)]]] = weight
+            else:
+                class_weights[_parse_token(token)] = weight
+        self.weights = np.maximum(self.weights, class_weights[combo_classes])
+
+    @classmethod
+    def from_classes(cls, class_weights):
+        """Creates a range from one weight for each of the 169 starting hand classes"""
+        return cls(weights=np.asarray(class_weights, dtype=np.float64)[combo_classes])
+
+    @classmethod
+    def full(cls):
+        """Creates a range of every combination"""
+        return cls(weights=np.ones(len(combo_cards)))
+
+    def __repr__(self):
+        return 'Range({:g} combos)'.format(self.num_combos())
+
+    def __or__(self, other):
+        return Range(weights=np.maximum(self.weights, other.weights))
+
+    def __and__(self, other):
+        return Range(weights=np.minimum(self.weights, other.weights))
+
+    def __sub__(self, other):
+        return Range(weights=np.clip(self.weights - other.weights, 0, 1))
+
+    def __contains__(self, hand):
+        card1, card2 = to_ints(hand)
+        return self.weights[combo_index[card1, card2]] > 0
+
+    def weight(self, hand):
+        card1, card2 = to_ints(hand)
+        return float(self.weights[combo_index[card1, card2]])
+
+    def num_combos(self):
+        """Returns the weighted number of combinations in the range"""
+        return float(self.weights.sum())
+
+    def class_weights(self):
+        """Returns the average weight of each of the 169 starting hand classes"""
+        return np.bincount(combo_classes, self.weights, 169) / np.bincount(combo_classes, minlength=169)
+
+    def remove(self, card_list):
+        """Returns a copy of the range without the combinations that use any of the cards, e.g. the board"""
+        return Range(weights=np.where(combo_masks & cards_mask(card_list), 0.0, self.weights))
+
+    def hands(self):
+        """Returns an array of the combinations with a positive weight and an array of their weights"""
+        present = self.weights > 0
+        return combo_cards[present], self.weights[present]
+
+
+three_betting = Range(three_betting_range)
+four_betting = Range(four_betting_range)
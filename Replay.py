@@ -0,0 +1,140 @@
+from Setup import *
+from Game import *
+from History import read_hands
+import math
+import time
+import multiprocessing
+
+# Decision latencies are counted in logarithmic bins, latency_resolution to a factor of ten, from 10^-7 seconds up
+latency_resolution = 40
+latency_bins = 8 * latency_resolution
+
+# Results of a replay
+# - decisions: Number of decision points replayed
+# - changed: Decisions where the agent now takes a different action
+# - resized: Decisions where the agent takes the same action with a different bet
+# - diffs: Counter of changed decisions keyed by (street, recorded action, new action)
+# - latency: Seconds per decision at the 50th, 90th, 99th and 99.9th percentiles, keyed by percentile
+ReplayResult = collections.namedtuple('ReplayResult', ['decisions', 'changed', 'resized', 'diffs', 'latency'])
+
+
+def _latency_bin(seconds):
+    return min(max(int((math.log10(max(seconds, 1e-12)) + 7) * latency_resolution), 0), latency_bins - 1)
+
+
+def latency_percentiles(histogram, percentiles=(50, 90, 99, 99.9)):
+    """Returns the latency in seconds below which each percentile of decisions fall, from a histogram of latencies"""
+    cumulative = np.cumsum(histogram)
+    if not len(cumulative) or cumulative[-1] == 0:
+        return {percentile: float('nan') for percentile in percentiles}
+    return {percentile: 10 ** ((int(np.searchsorted(cumulative, cumulative[-1] * percentile / 100)) + 1)
+                               / latency_resolution - 7) for percentile in percentiles}
+
+
+def _replay_file(path, agent, seed):
+    """Replays every decision in a history file
+
+    Returns:
+        The number of decisions, changed and resized decisions, a Counter of changes and a latency histogram
+    """
+    random.seed(int(seed.generate_state(1)[0]))
+    decisions = changed = resized = 0
+    diffs = collections.Counter()
+    histogram = np.zeros(latency_bins, dtype=np.int64)
+    game = None
+    for hand in read_hands(path):
+        street = 'preflop'
+        for event in hand:
+            kind = type(event)
+            if kind is PlayerAction:
+                position = event.position
+                log = game.action
+                # Players in between who were all in were passed over without being asked
+                while cursor != position:
+                    index = cursor - 1
+                    if log.seated[index] and log.in_hand[index] and log.waiting[index]:
+                        game.pass_all_in(cursor)
+                    cursor = cursor % game.num_players + 1
+                cursor = position % game.num_players + 1
+
+                start = time.perf_counter()
+                decision = agent.act(game, position)
+                histogram[_latency_bin(time.perf_counter() - start)] += 1
+                action, amount = game.resolve(position, decision)
+                decisions += 1
+                if action != event.action:
+                    changed += 1
+                    diffs[street, event.action, action] += 1
+                elif amount != event.bet:
+                    resized += 1
+
+                game.take_action(position, event.action, event.bet)
+                if log.stacks[position - 1] != event.stack or game.pot() != event.pot:
+                    raise ValueError('Hand {} in {} does not replay to the recorded chip counts'.format(
+                        hand[0].hand, path))
+            elif kind is Deal:
+                game.temp_card_holder[event.position] = list(event.cards)
+            elif kind is StreetChange:
+                street = event.street
+                game.start_street(street, event.board)
+                cursor = game.first_to_act(preflop=False)
+            elif kind is HandStart:
+                if game is None or (game.num_players, game.small_blind, game.big_blind) != \
+                        (event.num_players, event.small_blind, event.big_blind):
+                    game = Game(event.num_players, event.small_blind, event.big_blind, event.stacks, output=None)
+                game.stacks = list(event.stacks)
+                game.new_hand()
+                game.hand_number = event.hand
+            elif kind is PostBlind and event.blind == 'BB':
+                game.post_blinds()
+                cursor = game.first_to_act()
+    return decisions, changed, resized, diffs, histogram
+
+
+def _replay_star(task):
+    return _replay_file(*task)
+
+
+def replay(paths, agent=None, processes=None, seed=0):
+    """Asks an agent again for every decision in stored hand histories and counts the decisions that change
+
+    Each hand is rebuilt action by action with the same Game and Log code that played it, and the agent is asked
+    what it would do at each decision point before the recorded action is taken. Files are replayed in parallel and
+    read a chunk at a time, and only counts and a latency histogram are kept, so memory stays fixed however many
+    hands are replayed. Agents that mix actions at random change some decisions even when nothing else did, so
+    compare against a replay with the old code and the same seed.
+
+    Args:
+        paths (list): History files written by a HistoryWriter
+        agent: An agent with an act(game, position) method, e.g. a BotAgent with a new profile, defaulting to
+            BotAgent()
+        processes (int): Number of worker processes, defaulting to the number of cores
+        seed (int): Seed for the random module in each worker
+
+    Returns:
+        A ReplayResult
+    """
+    agent = agent or BotAgent()
+    seeds = np.random.SeedSequence(seed).spawn(len(paths))
+    tasks = [(path, agent, file_seed) for path, file_seed in zip(paths, seeds)]
+    totals = {'decisions': 0, 'changed': 0, 'resized': 0}
+    diffs = collections.Counter()
+    histogram = np.zeros(latency_bins, dtype=np.int64)
+
+    def merge(decisions, changed, resized, file_diffs, file_histogram):
+        totals['decisions'] += decisions
+        totals['changed'] += changed
+        totals['resized'] += resized
+        diffs.update(file_diffs)
+        histogram[:] += file_histogram
+
+    processes = pool_size(processes, len(tasks))
+    if processes == 1:
+        for task in tasks:
+            merge(*_replay_file(*task))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for file_result in pool.imap_unordered(_replay_star, tasks):
+                merge(*file_result)
+    return ReplayResult(totals['decisions'], totals['changed'], totals['resized'], diffs,
+                        latency_percentiles(histogram))
@@ -1,5 +1,8 @@
+import os
 import random
 import collections
+import itertools
+import numpy as np
 
 # Possible hands
 suits = ['h', 'd', 's', 'c']
@@ -9,88 +12,553 @@ four_betting_range = ['AA', 'KK', 'QQ', 'AKs']
 three_betting_range = ['AA', 'KK', 'QQ', 'AKs', 'JJ', 'TT', 'AQs', 'AKo', 'KQs', 'AQo', 'AJs', '99']
 hand_ranks = ['One pair', 'Two pair', 'Three of a kind', 'Straight', 'Flush', 'Full house',
               'Four of a kind', 'Straight flush']
+hand_categories = ['High card'] + hand_ranks
+
+# Integer card encoding
+# Every card is an integer from 0 to 51 equal to 4 * rank index + suit index, so '2h' is 0 and 'Ac' is 51
+rank_values = {rank: index for index, rank in enumerate(ranks)}
+suit_values = {suit: index for index, suit in enumerate(suits)}
+card_values = {rank + suit: 4 * rank_values[rank] + suit_values[suit] for rank in ranks for suit in suits}
+card_names = [rank + suit for rank in ranks for suit in suits]
+card_ranks = [card >> 2 for card in range(52)]
+card_suits = [card & 3 for card in range(52)]
+# 13-bit rank masks (bit r set for rank index r) and 52-bit card masks (13 bits per suit)
+rank_bits = [1 << (card >> 2) for card in range(52)]
+card_bits = [1 << (13 * (card & 3) + (card >> 2)) for card in range(52)]
+# Rank windows for the ten straights, from the wheel (A-5) up to broadway (T-A)
+straight_windows = [0b1000000001111] + [0b11111 << low for low in range(9)]
+popcount = [bin(mask).count('1') for mask in range(1 << 13)]
 
 
 class Card:
-    """Defines a card given a rank and a suit"""
+    """Defines a card given a rank and a suit
 
-    def __init__(self, rank, suit):
-        self.rank = rank
-        self.suit = suit
+    Cards are interned, so there is exactly one Card object for each of the 52 cards and Card('A', 'h') is
+    Card('A', 'h'). Each card carries its integer encoding along with its rank index, suit index and bits.
+    """
+
+    __slots__ = ('rank', 'suit', 'value', 'rank_index', 'suit_index', 'rank_bit', 'bit')
+
+    def __new__(cls, rank, suit):
+        return deck_cards[card_values[rank + suit]]
+
+    @classmethod
+    def _intern(cls, value):
+        card = object.__new__(cls)
+        card.rank = ranks[value >> 2]
+        card.suit = suits[value & 3]
+        card.value = value
+        card.rank_index = value >> 2
+        card.suit_index = value & 3
+        card.rank_bit = rank_bits[value]
+        card.bit = card_bits[value]
+        return card
+
+    def __int__(self):
+        return self.value
+
+    def __index__(self):
+        return self.value
+
+    def __repr__(self):
+        return 'Card({!r}, {!r})'.format(self.rank, self.suit)
+
+    def __reduce__(self):
+        return Card, (self.rank, self.suit)
 
     def show(self):
         return self.rank + self.suit
 
 
+deck_cards = [Card._intern(value) for value in range(52)]
+
+
+def to_int(card):
+    """Converts a two-character string, a Card or an integer into the integer encoding of a card"""
+    if type(card) is int:
+        return card
+    if isinstance(card, str):
+        return card_values[card]
+    if isinstance(card, Card):
+        return card.value
+    return int(card)
+
+
+def to_ints(card_list):
+    """Converts a list of cards in any accepted form into a list of integers"""
+    return [to_int(card) for card in card_list]
+
+
+def to_str(card):
+    """Converts a card in any accepted form into its two-character string, e.g. 'Ah'"""
+    return card_names[to_int(card)]
+
+
+def to_strs(card_list):
+    """Converts a list of cards in any accepted form into a list of two-character strings"""
+    return [to_str(card) for card in card_list]
+
+
+# Card masks
+full_mask = (1 << 52) - 1
+bit_cards = [4 * (bit % 13) + bit // 13 for bit in range(52)]
+
+
+def cards_mask(card_list):
+    """Returns the mask of card_bits covering a list of cards in any accepted form"""
+    mask = 0
+    for card in card_list:
+        mask |= card_bits[to_int(card)]
+    return mask
+
+
+def mask_cards(mask):
+    """Returns the integer cards whose bits are set in a mask, in bit order"""
+    card_list = []
+    while mask:
+        low = mask & -mask
+        card_list.append(bit_cards[low.bit_length() - 1])
+        mask ^= low
+    return card_list
+
+
+# Hand evaluator
+# Hand strengths run from 1 (7-5-4-3-2 unsuited) to 7462 (royal flush). Higher is better and equal strengths tie.
+# Every card has a packed key: its rank key shifted above four 3-bit suit counters. Rank key sums are unique for
+# any multiset of 5, 6 or 7 ranks, so summing the packed keys of a hand identifies both its ranks and any flush.
+rank_keys = [0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181]
+card_keys = [(rank_keys[card >> 2] << 12) | (1 << 3 * (card & 3)) for card in range(52)]
+# Suit with five or more cards for every combination of suit counters, or -1 if there is no flush
+flush_suits = [next((suit for suit in range(4) if (key >> 3 * suit) & 7 >= 5), -1) for key in range(1 << 12)]
+# Highest straight (rank index of its top card) contained in every 13-bit rank mask, or -1 if there is none
+straight_highs = [max([index + 3 for index, window in enumerate(straight_windows) if mask & window == window],
+                      default=-1) for mask in range(1 << 13)]
+# Ranks that would give every 13-bit rank mask a straight, or a higher straight than it already has
+straight_out_ranks = [sum(1 << rank for rank in range(13) if not mask >> rank & 1
+                          and straight_highs[mask | 1 << rank] > straight_highs[mask]) for mask in range(1 << 13)]
+# Number of distinct strengths in each hand category, from high card up to straight flush
+category_sizes = [1277, 2860, 858, 858, 10, 1277, 156, 156, 10]
+
+# Built on first use by _build_evaluator
+_rank_strengths = None
+_flush_strengths = None
+strength_categories = None
+strength_ranks = None
+
+# NumPy versions of the card and evaluator tables for batched evaluation, the latter built on first use by
+# _build_batch_evaluator
+card_keys_array = np.array(card_keys, dtype=np.int64)
+card_bits_array = np.array(card_bits, dtype=np.int64)
+flush_suits_array = np.array(flush_suits, dtype=np.int8)
+_rank_strength_arrays = None
+_flush_strength_array = None
+_strength_category_array = None
+
+
+def _straight_ranks(high):
+    """Returns the five ranks of the straight with the given top card, e.g. (3, 2, 1, 0, 12) for the wheel"""
+    return tuple(high - n if high - n >= 0 else 12 for n in range(5))
+
+
+def _rank_value(counts):
+    """Returns the category and the best five ranks in order of significance for a multiset of ranks
+
+    Args:
+        counts (list): The number of cards of each rank index
+    """
+    by_count = [[rank for rank in range(12, -1, -1) if counts[rank] >= n] for n in range(5)]
+    high = straight_highs[sum(1 << rank for rank in by_count[1])]
+    if by_count[4]:
+        quads = by_count[4][0]
+        return 7, (quads,) * 4 + tuple(rank for rank in by_count[1] if rank != quads)[:1]
+    if by_count[3] and len(by_count[2]) >= 2:
+        trips = by_count[3][0]
+        pair = [rank for rank in by_count[2] if rank != trips][0]
+        return 6, (trips,) * 3 + (pair,) * 2
+    if high >= 0:
+        return 4, _straight_ranks(high)
+    if by_count[3]:
+        trips = by_count[3][0]
+        return 3, (trips,) * 3 + tuple(rank for rank in by_count[1] if rank != trips)[:2]
+    if len(by_count[2]) >= 2:
+        pairs = by_count[2][:2]
+        kicker = [rank for rank in by_count[1] if rank not in pairs][0]
+        return 2, (pairs[0],) * 2 + (pairs[1],) * 2 + (kicker,)
+    if by_count[2]:
+        pair = by_count[2][0]
+        return 1, (pair,) * 2 + tuple(rank for rank in by_count[1] if rank != pair)[:3]
+    return 0, tuple(by_count[1][:5])
+
+
+def _flush_value(mask):
+    """Returns the category and the best five ranks for the 13-bit rank mask of the flush suit"""
+    high = straight_highs[mask]
+    if high >= 0:
+        return 8, _straight_ranks(high)
+    return 5, tuple(rank for rank in range(12, -1, -1) if mask >> rank & 1)[:5]
+
+
+def _rank_multisets(num_cards):
+    """Yields the count of each rank for every multiset of num_cards ranks with at most four of any rank"""
+    for combination in itertools.combinations_with_replacement(range(13), num_cards):
+        counts = [0] * 13
+        for rank in combination:
+            counts[rank] += 1
+        if max(counts) <= 4:
+            yield counts
+
+
+def _build_evaluator():
+    """Enumerates every distinct five-card hand value and fills in the strength lookup tables"""
+    global _rank_strengths, _flush_strengths, strength_categories, strength_ranks
+    values = {_rank_value(counts) for counts in _rank_multisets(5)}
+    values.update(_flush_value(mask) for mask in range(1 << 13) if popcount[mask] == 5)
+    values = sorted(values)
+    strengths = {value: strength for strength, value in enumerate(values, 1)}
+
+    rank_strengths = [None] * 8
+    for num_cards in range(5, 8):
+        rank_strengths[num_cards] = {sum(rank_keys[rank] * count for rank, count in enumerate(counts)):
+                                     strengths[_rank_value(counts)] for counts in _rank_multisets(num_cards)}
+    flush_strengths = [strengths[_flush_value(mask)] if popcount[mask] >= 5 else 0 for mask in range(1 << 13)]
+
+    strength_categories = [None] + [category for category, best_ranks in values]
+    strength_ranks = [None] + [best_ranks for category, best_ranks in values]
+    _rank_strengths, _flush_strengths = rank_strengths, flush_strengths
+
+
+def evaluate(card_list):
+    """Returns the strength of the best five-card hand
+
+    A call costs about 0.6 microseconds for seven cards, most of it in summing the card keys. To score many hands
+    that share cards, such as every player's hand on one board, sum the shared keys once and use evaluate_key, which
+    costs about half as much.
+
+    Args:
+        card_list (list): 5, 6 or 7 cards in their integer encoding
+
+    Returns:
+        An integer between 1 and 7462, where a higher number is a stronger hand
+    """
+    if _flush_strengths is None:
+        _build_evaluator()
+    key = 0
+    for card in card_list:
+        key += card_keys[card]
+    suit = flush_suits[key & 4095]
+    if suit < 0:
+        return _rank_strengths[len(card_list)][key >> 12]
+    mask = 0
+    for card in card_list:
+        if card & 3 == suit:
+            mask |= rank_bits[card]
+    return _flush_strengths[mask]
+
+
+def evaluate_key(key, bits, num_cards):
+    """Returns the strength of one hand from its summed packed key and card bits, like evaluate_keys for one hand
+
+    Args:
+        key (int): Sum of card_keys over the cards of the hand
+        bits (int): Union of card_bits over the cards of the hand
+        num_cards (int): The number of cards in the hand, 5, 6 or 7
+    """
+    if _flush_strengths is None:
+        _build_evaluator()
+    suit = flush_suits[key & 4095]
+    if suit < 0:
+        return _rank_strengths[num_cards][key >> 12]
+    return _flush_strengths[(bits >> 13 * suit) & 8191]
+
+
+def _build_batch_evaluator():
+    """Expands the rank tables into dense arrays indexed directly by the rank key sums"""
+    global _rank_strength_arrays, _flush_strength_array, _strength_category_array
+    if _flush_strengths is None:
+        _build_evaluator()
+    rank_strength_arrays = [None] * 8
+    for num_cards in range(5, 8):
+        keys = np.fromiter(_rank_strengths[num_cards].keys(), dtype=np.int64)
+        table = np.zeros(keys.max() + 1, dtype=np.uint16)
+        table[keys] = np.fromiter(_rank_strengths[num_cards].values(), dtype=np.uint16)
+        rank_strength_arrays[num_cards] = table
+    _strength_category_array = np.array([-1] + strength_categories[1:], dtype=np.int8)
+    _flush_strength_array = np.array(_flush_strengths, dtype=np.uint16)
+    _rank_strength_arrays = rank_strength_arrays
+
+
+def load_evaluator():
+    """Builds the evaluator tables now rather than on first use, e.g. before forking worker processes"""
+    if _rank_strength_arrays is None:
+        _build_batch_evaluator()
+
+
+def pool_size(processes, tasks):
+    """Returns how many worker processes to start for a number of tasks, defaulting to one per core
+
+    When more than one is needed the evaluator tables are built first, so that the forked workers share them rather
+    than each building their own.
+
+    Args:
+        processes (int): Number of processes asked for, or None
+        tasks (int): Number of tasks to share out
+    """
+    processes = max(1, min(processes or os.cpu_count() or 1, tasks or 1))
+    if processes > 1:
+        load_evaluator()
+    return processes
+
+
+_data_tables = {}
+
+
+def data_table(directory, name):
+    """Memory-maps a precomputed table, such as Preflop_Data/equity_169.npy, the first time it is needed"""
+    path = os.path.join(directory, name + '.npy')
+    if path not in _data_tables:
+        _data_tables[path] = np.load(path, mmap_mode='r')
+    return _data_tables[path]
+
+
+def evaluate_keys(keys, bits, num_cards):
+    """Evaluates hands from their summed packed keys and card bits, without touching the individual cards
+
+    The sums can be built up incrementally, e.g. once for a board and then once per runout card, as long as every
+    hand contains the same number of cards.
+
+    Args:
+        keys (array): Sums of card_keys_array over the cards of each hand
+        bits (array): Sums (equivalently unions) of card_bits_array over the cards of each hand
+        num_cards (int): The number of cards in every hand, 5, 6 or 7
+
+    Returns:
+        An array of strengths with the same shape as keys
+    """
+    if _rank_strength_arrays is None:
+        _build_batch_evaluator()
+    keys = np.asarray(keys, dtype=np.int64)
+    strengths = _rank_strength_arrays[num_cards][keys >> 12]
+    suits = flush_suits_array[keys & 4095]
+    flushes = np.nonzero(suits >= 0)
+    if flushes[0].size:
+        flush_masks = (np.asarray(bits)[flushes] >> (13 * suits[flushes].astype(np.int64))) & 8191
+        strengths[flushes] = _flush_strength_array[flush_masks]
+    return strengths
+
+
+def evaluate_batch(cards):
+    """Evaluates many hands at once with vectorized table lookups
+
+    Args:
+        cards (array): An integer array of shape (N, 5), (N, 6) or (N, 7) holding one hand per row
+
+    Returns:
+        A tuple of two arrays of shape (N,): the strength of each hand and its index into hand_categories
+    """
+    if _rank_strength_arrays is None:
+        _build_batch_evaluator()
+    cards = np.asarray(cards)
+    num_cards = cards.shape[1]
+    keys = card_keys_array[cards[:, 0]]
+    for column in range(1, num_cards):
+        keys += card_keys_array[cards[:, column]]
+    strengths = _rank_strength_arrays[num_cards][keys >> 12]
+    suits = flush_suits_array[keys & 4095]
+    # Only the few hands with five cards of a suit need their card bits
+    flushes = np.flatnonzero(suits >= 0)
+    if flushes.size:
+        bits = card_bits_array[cards[flushes]].sum(axis=1)
+        strengths[flushes] = _flush_strength_array[(bits >> 13 * suits[flushes].astype(np.int64)) & 8191]
+    return strengths, _strength_category_array[strengths]
+
+
+def hand_category(strength):
+    """Returns the index into hand_categories (0 for high card up to 8 for a straight flush) of a strength"""
+    if strength_categories is None:
+        _build_evaluator()
+    return strength_categories[strength]
+
+
+def best_five_cards(card_list, strength):
+    """Picks the five cards that make up a hand of the given strength, in order of significance
+
+    Args:
+        card_list (list): The cards the strength was evaluated from, in their integer encoding
+        strength (int): The value returned by evaluate(card_list)
+    """
+    category = hand_category(strength)
+    remaining = sorted(card_list, reverse=True)
+    if category == 5 or category == 8:
+        suit = flush_suits[sum(1 << 3 * (card & 3) for card in card_list)]
+        remaining = [card for card in remaining if card & 3 == suit]
+    best_five = []
+    for rank in strength_ranks[strength]:
+        for card in remaining:
+            if card >> 2 == rank:
+                best_five.append(card)
+                remaining.remove(card)
+                break
+    return best_five
+
+
+# Starting hand classes
+# The 169 distinct starting hands are indexed 13 * row + column in the usual grid: pairs are on the diagonal,
+# suited hands at (higher rank, lower rank) and unsuited hands at (lower rank, higher rank)
+class_names = [ranks[max(row, column)] + ranks[min(row, column)] + ('' if row == column else 's' if row > column
+                                                                    else 'o')
+               for row in range(13) for column in range(13)]
+
+
+def hand_class(card1, card2):
+    """Returns the index (0-168) of the starting hand class of two hole cards, e.g. 'AKs' for Ah Kh"""
+    card1, card2 = to_int(card1), to_int(card2)
+    high, low = max(card1 >> 2, card2 >> 2), min(card1 >> 2, card2 >> 2)
+    if card1 & 3 == card2 & 3:
+        return 13 * high + low
+    return 13 * low + high
+
+
+def _class_combos():
+    """Lists every two-card combination of each class, with the higher card first"""
+    combos = [[] for index in range(169)]
+    for combo in itertools.combinations(range(51, -1, -1), 2):
+        combos[hand_class(*combo)].append(combo)
+    return combos
+
+
+class_combos = _class_combos()
+
+
 class Deck:
-    """Creates the deck of 52 playing cards"""
+    """Creates the deck of 52 playing cards
+
+    Cards that have left the deck are tracked in a 52-bit mask of card_bits, so removing cards and drawing the
+    remaining ones never rebuilds any lists.
 
-    def __init__(self):
-        self.contents = []
-        self.contents = [Card(rank, suit) for rank in ranks for suit in suits]
-        random.shuffle(self.contents)
+    Args:
+        rng (random.Random): Source of the shuffle, defaulting to the random module. A numpy.random.Generator
+            also works
+        dead (list): Cards that are already out of the deck
+
+    Attributes:
+        contents (list): The shuffled cards, drawn from front to back
+        dead (int): Mask of the cards out of the deck, either drawn or marked dead
+    """
+
+    def __init__(self, rng=None, dead=None):
+        # Sorting on a random key per card is a uniform shuffle, and takes one call to random() per card rather than
+        # shuffle's slower draws of bounded integers
+        random_key = (rng or random).random
+        self.contents = sorted(range(52), key=lambda card: random_key())
+        self.dead = 0
+        self.position = 0
+        if dead is not None:
+            self.remove(dead)
 
     def show(self):
-        deck = []
-        for card in self.contents:
-            deck.append(card.show())
-        return deck
+        return to_strs(self.contents)
+
+    def remove(self, card_list):
+        """Marks cards as out of the deck"""
+        self.dead |= cards_mask(card_list)
+
+    def remaining(self):
+        """Returns the cards still in the deck, in dealing order"""
+        return [card for card in self.contents if not self.dead & card_bits[card]]
+
+    def draw(self, num_cards=1):
+        """Deals the next cards from the top of the deck, skipping any that are dead"""
+        drawn = []
+        while len(drawn) < num_cards:
+            card = self.contents[self.position]
+            self.position += 1
+            if not self.dead & card_bits[card]:
+                self.dead |= card_bits[card]
+                drawn.append(card)
+        return drawn
 
     def update(self, hand, flop=None, turn=None, river=None):
-        deck = self.show()
-        updated_deck = set(deck) - set(hand)
+        dead = self.dead | cards_mask(hand)
         if flop is not None:
-            updated_deck = updated_deck - set(flop)
+            dead |= cards_mask(flop)
             if turn is not None:
-                updated_deck = updated_deck - set(list(turn))
+                dead |= card_bits[to_int(turn)]
                 if river is not None:
-                    updated_deck = updated_deck - set(list(river))
-        return list(updated_deck)
+                    dead |= card_bits[to_int(river)]
+        return [card for card in self.contents if not dead & card_bits[card]]
+
+    def deal_batch(self, num_deals, num_players, rng=None):
+        """Deals many complete hands at once from the cards still in the deck
+
+        Args:
+            num_deals (int): Number of deals
+            num_players (int): Number of players dealt two hole cards each
+            rng (numpy.random.Generator): Source of the shuffles, or a seed for one
+
+        Returns:
+            An int8 array of shape (num_deals, 2 * num_players + 5). Columns 2 * (seat - 1) and 2 * (seat - 1) + 1
+            hold the hole cards of each seat and the last five columns hold the board.
+        """
+        rng = np.random.default_rng(rng)
+        live = np.array(mask_cards(~self.dead & full_mask), dtype=np.int8)
+        return rng.permuted(np.tile(live, (num_deals, 1)), axis=1)[:, :2 * num_players + 5]
 
 
 class Dealer:
-    """Deals out hands and the community cards"""
+    """Deals out hands and the community cards
 
-    def __init__(self):
-        self.deck = Deck().show()
+    Hole cards come off the top of the deck as they are dealt. Each street then burns one card before dealing its
+    community cards, and the flop, turn and river are remembered once dealt.
+
+    Args:
+        rng (random.Random): Source of the shuffle, defaulting to the random module
+    """
+
+    def __init__(self, rng=None):
+        self.cards = Deck(rng)
+        self.deck = self.cards.contents
+        self.hands_dealt = []
+        self.board = []
         self.num_dealt = 0
         self.flopped = False
         self.turned = False
         self.rivered = False
 
     def deal_hand(self):
-        deck = self.deck
-        hand_dealt = deck[self.num_dealt: self.num_dealt + 2]
+        hand_dealt = self.cards.draw(2)
+        self.hands_dealt += hand_dealt
         self.num_dealt = self.num_dealt + 2
         return hand_dealt
 
+    def _burn_and_deal(self, num_cards):
+        self.cards.draw(1)
+        dealt = self.cards.draw(num_cards)
+        self.board += dealt
+        return dealt
+
     def flop(self):
-        deck = self.deck
-        flop = deck[self.num_dealt + 1: self.num_dealt + 4]
-        self.flopped = True
-        return flop
+        if not self.flopped:
+            self._burn_and_deal(3)
+            self.flopped = True
+        return self.board[0:3]
 
     def turn(self):
-        deck = self.deck
-        turn = deck[self.num_dealt + 5]
-        self.turned = True
-        return turn
+        if not self.turned:
+            self.flop()
+            self._burn_and_deal(1)
+            self.turned = True
+        return self.board[3]
 
     def river(self):
-        deck = self.deck
-        river = deck[self.num_dealt + 7]
-        self.rivered = True
-        return river
+        if not self.rivered:
+            self.turn()
+            self._burn_and_deal(1)
+            self.rivered = True
+        return self.board[4]
 
     def cards_out(self):
-        board = []
-        if self.flopped:
-            board += self.flop()
-        if self.turned:
-            board += [self.turn()]
-        if self.rivered:
-            board += [self.river()]
-        return self.deal_hand() + board
+        """Returns every hole card dealt so far followed by the board"""
+        return self.hands_dealt + self.board
 
     def run_out(self):
         flop = self.flop()
@@ -102,254 +570,148 @@ class Dealer:
 class PokerHand:
     """For use in classifying hand ranks
 
+    Hands can be compared by their strength, where a higher strength wins at showdown.
+
     Args:
-        card_list (list): A list containing the hand dealt along with the cards on the board
+        card_list (list): A list containing the hand dealt along with the cards on the board. Cards may be
+            integers, Card objects or two-character strings
+
+    Attributes:
+        strength (int): The strength of the best five cards, between 1 and 7462
     """
 
     def __init__(self, card_list):
-        self.card_list = card_list
+        self.card_list = to_ints(card_list)
         self.num_cards = len(card_list)
+        self.strength = evaluate(self.card_list)
         self.best_five = None
 
-    def classify_hand(self):
-        hand = []
-        rank_dict = collections.defaultdict(int)
-        suit_dict = collections.defaultdict(int)
-        for card in self.card_list:
-            rank_dict[card[0]] += 1
-            suit_dict[card[1]] += 1
-
-        # One pair
-        if len(rank_dict) == self.num_cards - 1:
-            hand.append('One pair')
-
-        # Three of a kind or two pair
-        if len(rank_dict) == self.num_cards - 2:
-            if 3 in rank_dict.values():
-                hand.append('Three of a kind')
-            else:
-                hand.append('Two pair')
-
-        # Four of a kind or full house or two pair
-        if len(rank_dict) == self.num_cards - 3:
-            if 4 in rank_dict.values():
-                hand.append('Four of a kind')
-            elif 3 in rank_dict.values():
-                hand.append('Full house')
-            else:
-                hand.append('Two pair')
+    def category(self):
+        """Returns the index into hand_categories, from 0 (high card) up to 8 (straight flush)"""
+        return hand_category(self.strength)
 
-        # Four of a kind or full house
-        if len(rank_dict) == self.num_cards - 4:
-            if 4 in rank_dict.values():
-                hand.append('Four of a kind')
-            else:
-                hand.append('Full house')
-
-        # Four of a kind
-        if len(rank_dict) == self.num_cards - 5:
-            hand.append('Four of a kind')
-
-        # Flush or straight
-        straight, flush, straight_flush = False, False, False
-        if any(x in suit_dict.values() for x in [5, 6, 7]):
-            flush = True
-            flush_suit = max(suit_dict, key=suit_dict.get)
-
-        straight_ranks = ['A'] + ranks
-        for index, rank in enumerate(straight_ranks[0:9]):
-            if all(straight_ranks[index + n] in rank_dict.keys() for n in range(0, 5)):
-                straight = True
-                straight_cards = [straight_ranks[index + n] for n in range(0, 5)]
-
-        if straight and not flush:
-            hand.append('Straight')
-        elif flush and not straight:
-            hand.append('Flush')
-        elif flush and straight:
-            if all(card + flush_suit in self.card_list for card in straight_cards):
-                hand.append('Straight flush')
-            else:
-                hand.append('Flush')
-
-        # Selection
-        if len(hand) == 0:
-            high_card = max([ranks.index(x) for x in rank_dict.keys()])
-            hand = '{} high'.format(ranks[high_card])
-        elif len(hand) > 1:
-            strongest = max([hand_ranks.index(classified) for classified in hand])
-            hand = hand_ranks[strongest]
-        else:
-            hand = hand[0]
-
-        # Find the best five cards
-        best_five = []
-        if hand == 'One pair':
-            pair = [card for card, count in rank_dict.items() if count == 2]
-            # Add the pair
-            for card in self.card_list:
-                if card[0] == pair[0]:
-                    best_five += [card]
-            # Add the remaining cards by rank
-            for i in range(3):
-                high_card = ranks[0] + 'g'
-                for card in self.card_list:
-                    if ranks.index(card[0]) >= ranks.index(high_card[0]) and card[0] != pair[0] \
-                            and card not in best_five:
-                        high_card = card
-                best_five += [high_card]
-
-        elif hand == 'Two pair':
-            pairs = [card for card, count in rank_dict.items() if count == 2]
-            if ranks.index(pairs[1]) > ranks.index(pairs[0]):
-                pairs[0], pairs[1] = pairs[1], pairs[0]
-            # Add the pairs
-            for card in self.card_list:
-                if card[0] == pairs[0]:
-                    best_five += [card]
-            for card in self.card_list:
-                if card[0] == pairs[1]:
-                    best_five += [card]
-            # Add the remaining card by rank
-            high_card = ranks[0] + 'g'
-            for card in self.card_list:
-                if ranks.index(card[0]) >= ranks.index(high_card[0]) and card[0] != pairs[0] and card[0] != pairs[1]:
-                    high_card = card
-            best_five += [high_card]
-
-        elif hand == 'Three of a kind':
-            trips = [card for card, count in rank_dict.items() if count == 3]
-            # Add the trips
-            for card in self.card_list:
-                if card[0] == trips[0]:
-                    best_five += [card]
-            # Add the remaining cards by rank
-            for i in range(2):
-                high_card = ranks[0] + 'g'
-                for card in self.card_list:
-                    if ranks.index(card[0]) >= ranks.index(high_card[0]) \
-                            and card[0] != trips[0] and card not in best_five:
-                        high_card = card
-                best_five += [high_card]
-
-        elif hand == 'Four of a kind':
-            quads = [card for card, count in rank_dict.items() if count == 4]
-            # Add the quads
-            for card in self.card_list:
-                if card[0] == quads[0]:
-                    best_five += [card]
-            # Add the remaining card by rank
-            high_card = ranks[0] + 'g'
-            for card in self.card_list:
-                if ranks.index(card[0]) >= ranks.index(high_card[0]) and card[0] != quads[0]:
-                    high_card = card
-            best_five += [high_card]
-
-        elif hand == 'Full house':
-            trips = [card for card, count in rank_dict.items() if count == 3]
-            pairs = [card for card, count in rank_dict.items() if count == 2]
-            if len(trips) > 1:
-                if ranks.index(trips[1]) > ranks.index(trips[0]):
-                    trips[0], trips[1] = trips[1], trips[0]
-                pairs = trips[1]
-            if len(pairs) > 1:
-                if ranks.index(pairs[1]) > ranks.index(pairs[0]):
-                    pairs[0], pairs[1] = pairs[1], pairs[0]
-            # Add the full house
-            for card in self.card_list:
-                if card[0] == trips[0]:
-                    best_five += [card]
-            for card in self.card_list:
-                if card[0] == pairs[0]:
-                    if len(best_five) < 5:
-                        best_five += [card]
-
-        elif hand == "Straight":
-            for straight_card in straight_cards:
-                for card in self.card_list:
-                    if straight_card == card[0]:
-                        best_five += [card]
-                        break
-
-        elif hand == 'Flush':
-            flush_cards = []
-            for card in self.card_list:
-                if card[1] == flush_suit:
-                    flush_cards.append(card)
-            for i in range(5):
-                high_card = ranks[0] + 'g'
-                for card in flush_cards:
-                    if ranks.index(card[0]) >= ranks.index(high_card[0]) and card not in best_five:
-                        high_card = card
-                best_five += [high_card]
-
-        elif hand == 'Straight flush':
-            for index, rank in enumerate(straight_ranks[0:9]):
-                straight_flush_count = 0
-                straight_flush_list = []
-                if all(straight_ranks[index + n] in rank_dict.keys() for n in range(0, 5)):
-                    straight_cards = [straight_ranks[index + n] for n in range(0, 5)]
-                    for straight_card in straight_cards:
-                        for card in self.card_list:
-                            if straight_card == card[0]:
-                                if flush_suit == card[1]:
-                                    straight_flush_count += 1
-                                    straight_flush_list += [card]
-                    if straight_flush_count == 5:
-                        best_five.clear()
-                        best_five += straight_flush_list
-
-        self.best_five = best_five
-
-        return hand
+    def classify_hand(self):
+        self.best_five = best_five_cards(self.card_list, self.strength)
+        category = hand_category(self.strength)
+        if category == 0:
+            return '{} high'.format(ranks[self.best_five[0] >> 2])
+        return hand_categories[category]
 
 
 class Draw:
     """Classifies straight or flush draws if they exist
 
     Args:
-        card_list (list): A list containing the hand dealt along with the cards on the board
+        card_list (list): A list containing the hand dealt along with the cards on the board. Cards may be
+            integers, Card objects or two-character strings
     """
 
     def __init__(self, card_list):
-        self.card_list = card_list
+        self.card_list = to_ints(card_list)
         self.num_cards = len(card_list)
 
     def straight_draw(self):
-        rank_dict = collections.defaultdict(int)
+        rank_mask = 0
         for card in self.card_list:
-            rank_dict[card[0]] += 1
-
-        def one_vs_two_outs(cards, possibilities):
-            missing_card = list(set(cards) - set(list(rank_dict.keys())))[0]
-            if len(possibilities) >= 2:
-                return 'Two'
-            else:
-                return 'One'
-
-        straight_draw, straight_info = False, None
-        straight_ranks = ['A'] + ranks
-        possible_straights = []
-        for index, rank in enumerate(straight_ranks[0:9]):
-            card_num = 0
-            for n in range(0, 5):
-                one_of_five = straight_ranks[index + n]
-                if one_of_five in rank_dict.keys():
-                    card_num += 1
-            if card_num == 4:
-                straight_draw = True
-                straight_cards = straight_ranks[index + 0:index + 5]
-                possible_straights.append(straight_cards)
-                straight_info = one_vs_two_outs(straight_cards, possible_straights)
-        return straight_draw, straight_info
+            rank_mask |= rank_bits[card]
+
+        # A draw is any straight window with exactly four of its five ranks present
+        possible_straights = [window for window in straight_windows if popcount[rank_mask & window] == 4]
+        if not possible_straights:
+            return False, None
+        elif len(possible_straights) >= 2:
+            return True, 'Two'
+        else:
+            return True, 'One'
 
     def flush_draw(self):
         suit_dict = collections.defaultdict(int)
         for card in self.card_list:
-            suit_dict[card[1]] += 1
+            suit_dict[card & 3] += 1
 
         flush_draw, flush_draw_suit = False, None
         if 4 in suit_dict.values():
             flush_draw = True
             flush_draw_suit = max(suit_dict, key=suit_dict.get)
         return flush_draw, flush_draw_suit
+
+    def outs(self):
+        """Finds the exact cards that improve the hand, treating the first two cards as the hand dealt
+
+        Only improvements that use a hole card count. An out is also listed as discounted when it improves the board
+        for everyone else: straight and flush outs that pair the board, straight outs that put a third card of a
+        suit on the board, and set, trips or two pair outs that put three cards to a straight or flush on the board.
+
+        Returns:
+            A dictionary mapping 'Straight', 'Flush', 'Set', 'Trips' and 'Two pair' to the out cards that make
+            each hand, plus 'Discounted' to the outs among them that also improve the board
+        """
+        hand_dealt, board = self.card_list[0:2], self.card_list[2:]
+        rank_mask, board_mask, suit_counts, board_suits = 0, 0, [0] * 4, [0] * 4
+        for card in self.card_list:
+            rank_mask |= rank_bits[card]
+            suit_counts[card & 3] += 1
+        for card in board:
+            board_mask |= rank_bits[card]
+            board_suits[card & 3] += 1
+        dead = cards_mask(self.card_list)
+        category = hand_category(evaluate(self.card_list)) if self.num_cards >= 5 else 0
+        hole_ranks = [card >> 2 for card in hand_dealt]
+
+        def live(rank_set, suit=None):
+            return [card for card in range(52) if card >> 2 in rank_set and (suit is None or card & 3 == suit)
+                    and not dead & card_bits[card]]
+
+        outs = {'Straight': [], 'Flush': [], 'Set': [], 'Trips': [], 'Two pair': []}
+        if category < 5:
+            for suit in range(4):
+                if suit_counts[suit] == 4 and board_suits[suit] < 4:
+                    outs['Flush'] = live(range(13), suit)
+        if category < 4:
+            # Straights the board would make on its own don't count
+            straight_ranks = [rank for rank in range(13) if straight_out_ranks[rank_mask] >> rank & 1
+                              and straight_highs[board_mask | 1 << rank] < straight_highs[rank_mask | 1 << rank]]
+            outs['Straight'] = [card for card in live(straight_ranks) if card not in outs['Flush']]
+        if category <= 2:
+            if hole_ranks[0] == hole_ranks[1] and not board_mask >> hole_ranks[0] & 1:
+                outs['Set'] = live(hole_ranks[:1])
+            else:
+                paired = [rank for rank in hole_ranks if board_mask >> rank & 1]
+                unpaired = [rank for rank in hole_ranks if not board_mask >> rank & 1]
+                outs['Trips'] = live(paired)
+                if category == 1:
+                    outs['Two pair'] = live(unpaired)
+
+        def pairs_board(card):
+            return board_mask >> (card >> 2) & 1
+
+        def flushes_board(card, count):
+            return board_suits[card & 3] + 1 >= count
+
+        def straightens_board(card):
+            mask = board_mask | rank_bits[card]
+            return mask != board_mask and any(window & rank_bits[card] and popcount[window & mask] >= 3
+                                              for window in straight_windows)
+
+        outs['Discounted'] = [card for card in outs['Straight'] if pairs_board(card) or flushes_board(card, 3)]
+        outs['Discounted'] += [card for card in outs['Flush'] if pairs_board(card)]
+        outs['Discounted'] += [card for improvement in ['Set', 'Trips', 'Two pair'] for card in outs[improvement]
+                               if flushes_board(card, 3) or straightens_board(card)]
+        return outs
+
+    def num_outs(self):
+        """Counts the outs, with discounted outs counting as half an out"""
+        outs = self.outs()
+        improving = {card for improvement, out_cards in outs.items() if improvement != 'Discounted'
+                     for card in out_cards}
+        return len(improving) - len(set(outs['Discounted'])) / 2
+
+    def hit_probability(self, cards_to_come=1):
+        """Returns the probability of hitting an out within the next one or two cards"""
+        outs = self.num_outs()
+        unseen = 52 - self.num_cards
+        misses = 1
+        for n in range(cards_to_come):
+            misses *= (unseen - n - outs) / (unseen - n)
+        return 1 - misses
+
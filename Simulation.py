@@ -0,0 +1,145 @@
+from Setup import *
+from Game import *
+from History import HistoryWriter, shard_path
+import os
+import json
+import math
+import multiprocessing
+
+# Results of a self-play run, in big blinds. Every array has one entry per seat.
+# - bb_per_100: Chips won per 100 hands
+# - confidence: Half-width of the 95% confidence interval of bb_per_100
+# - win_rate: Share of hands in which the seat won at least part of the pot
+# - positions: The same figures pooled over the seats that share a relative position, keyed by position name
+SelfPlayResult = collections.namedtuple('SelfPlayResult', ['hands', 'bb_per_100', 'confidence', 'win_rate',
+                                                           'positions'])
+
+
+def _play_batch(table, batch, num_hands, num_players, small_blind, big_blind, stack, agents, seed, history=None):
+    """Plays a batch of hands at one table, each starting from full stacks, recording them if history is a directory
+
+    Returns:
+        The table and batch numbers, each hand's result for each seat in big blinds (num_hands x num_players), and
+        which seats won each hand
+    """
+    deal_seed, strategy_seed = seed.generate_state(2).tolist()
+    # The bots mix their preflop actions with the random module, so it is seeded as well as the shuffle
+    random.seed(strategy_seed)
+    subscribers = []
+    if history is not None:
+        path = shard_path(history, table, batch)
+        # A batch that was cut short is played again from the start
+        if os.path.exists(path):
+            os.remove(path)
+        subscribers.append(HistoryWriter(path))
+    game = Game(num_players, small_blind, big_blind, [stack] * num_players, agents, output=None, seed=deal_seed,
+                subscribers=subscribers)
+    results = np.zeros((num_hands, num_players))
+    winners = np.zeros((num_hands, num_players), dtype=bool)
+    for hand in range(num_hands):
+        game.stacks = [stack] * num_players
+        results[hand] = game.play_hand()
+        winners[hand, [position - 1 for position in game.winners]] = True
+    for subscriber in subscribers:
+        subscriber.close()
+    return table, batch, results / big_blind, winners
+
+
+def _summarize(totals, num_players):
+    """Turns running totals into a SelfPlayResult"""
+    hands = totals['hands']
+
+    def rate(hands, total, squares):
+        if hands == 0:
+            return float('nan'), float('nan')
+        mean = total / hands
+        variance = max(squares / hands - mean ** 2, 0)
+        return 100 * mean, 100 * 1.96 * math.sqrt(variance / hands)
+
+    rates = [rate(hands, total, squares) for total, squares in zip(totals['total'], totals['squares'])]
+    positions = collections.OrderedDict()
+    for seat in range(num_players):
+        positions.setdefault(seat_position(seat + 1, num_players), []).append(seat)
+    pooled = {}
+    for position, seats in positions.items():
+        bb_per_100, confidence = rate(hands * len(seats), sum(totals['total'][seat] for seat in seats),
+                                      sum(totals['squares'][seat] for seat in seats))
+        win_rate = sum(totals['wins'][seat] for seat in seats) / max(hands * len(seats), 1)
+        pooled[position] = {'bb_per_100': bb_per_100, 'confidence': confidence, 'win_rate': win_rate}
+    return SelfPlayResult(hands, np.array([bb_per_100 for bb_per_100, confidence in rates]),
+                          np.array([confidence for bb_per_100, confidence in rates]),
+                          np.array(totals['wins']) / max(hands, 1), pooled)
+
+
+def self_play(num_tables=8, hands_per_table=1000, num_players=9, small_blind=0.05, big_blind=0.10, stack=10,
+              agents=None, batch_size=250, processes=None, seed=0, checkpoint=None, history=None):
+    """Plays many headless tables across a process pool and merges the results
+
+    Every table is split into batches of hands. Each batch deals from its own random stream spawned from the seed,
+    so the results only depend on the seed and the table and batch sizes, not on the number of processes or the
+    order batches finish in. Workers send back each batch's per-hand results in one array, and the totals are
+    written to the checkpoint file after every batch so that an interrupted run picks up where it left off.
+
+    Args:
+        num_tables (int): Number of tables
+        hands_per_table (int): Number of hands played at each table
+        num_players (int): Number of players at each table
+        small_blind (float): Value of small blind
+        big_blind (float): Value of big blind
+        stack (float): Chips each seat starts every hand with
+        agents (list): One agent per seat, as for Game, defaulting to a BotAgent in every seat
+        batch_size (int): Hands per batch
+        processes (int): Number of worker processes, defaulting to the number of cores
+        seed (int): Seed for the random streams
+        checkpoint (str): Path of a JSON file to save progress to and resume from
+        history (str): Directory to record the hands in, as one History shard per table and batch
+
+    Returns:
+        A SelfPlayResult
+    """
+    num_batches = -(-hands_per_table // batch_size)
+    run = {'num_tables': num_tables, 'hands_per_table': hands_per_table, 'num_players': num_players,
+           'small_blind': small_blind, 'big_blind': big_blind, 'stack': stack, 'batch_size': batch_size,
+           'seed': seed, 'agents': [type(agent).__name__ for agent in agents or []]}
+    totals = {'hands': 0, 'total': [0.0] * num_players, 'squares': [0.0] * num_players,
+              'wins': [0] * num_players, 'done': []}
+    if checkpoint is not None and os.path.exists(checkpoint):
+        with open(checkpoint) as file:
+            saved = json.load(file)
+        if saved['run'] != run:
+            raise ValueError('Checkpoint {} was saved by a run with different settings'.format(checkpoint))
+        totals = saved['totals']
+    done = {tuple(batch) for batch in totals['done']}
+
+    seeds = [table_seed.spawn(num_batches) for table_seed in np.random.SeedSequence(seed).spawn(num_tables)]
+    tasks = [(table, batch, min(batch_size, hands_per_table - batch * batch_size), num_players, small_blind,
+              big_blind, stack, agents, seeds[table][batch], history)
+             for table in range(num_tables) for batch in range(num_batches) if (table, batch) not in done]
+
+    def merge(table, batch, results, winners):
+        totals['hands'] += len(results)
+        totals['total'] = (np.array(totals['total']) + results.sum(axis=0)).tolist()
+        totals['squares'] = (np.array(totals['squares']) + (results ** 2).sum(axis=0)).tolist()
+        totals['wins'] = (np.array(totals['wins']) + winners.sum(axis=0)).tolist()
+        totals['done'].append([table, batch])
+        if checkpoint is not None:
+            partial_path = checkpoint + '.tmp'
+            with open(partial_path, 'w') as file:
+                json.dump({'run': run, 'totals': totals}, file)
+            os.replace(partial_path, checkpoint)
+
+    if history is not None:
+        os.makedirs(history, exist_ok=True)
+    processes = pool_size(processes, len(tasks))
+    if processes == 1:
+        for task in tasks:
+            merge(*_play_batch(*task))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for batch_result in pool.imap_unordered(_play_star, tasks):
+                merge(*batch_result)
+    return _summarize(totals, num_players)
+
+
+def _play_star(task):
+    return _play_batch(*task)
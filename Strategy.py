@@ -0,0 +1,218 @@
+from Setup import *
+from Range import *
+from Preflop import positions, decisions, position_index, decision_index, rule_dtype, rule_table
+import os
+import hashlib
+
+# Strategy profiles are text files of range notation, compiled into the same tables as the built-in Preflop rules
+#
+#     # Comments start with a hash
+#     [open]
+#     early/small 1: 77+, AKo, AQo, ATs+, A5s:0.25
+#     big 1: 22+, A2s+
+#     [three_bet]
+#     * 2: QQ+, AKo:0.25
+#     * 1: JJ-99, AKo, AQs
+#
+# Each section is one of the decisions and each line gives the hands that take an action (an integer, as returned
+# by the Preflop method for that decision) in one or more positions, separated by slashes, or * for all of them.
+# A weight below 1 mixes the action with the next lower action listed for that hand, or with folding (0).
+strategy_data = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Strategies')
+# Compiled profiles are cached here as .npy files named after a hash of the profile text
+strategy_cache = os.path.join(strategy_data, '__cache__')
+profiles = {}
+
+
+class Profile:
+    """A preflop strategy that can be passed to Preflop and Action in place of the built-in rules
+
+    Args:
+        name (str): Name of the profile
+        rules (array): A structured array of rule_dtype indexed by decision, position and class (4 x 5 x 169)
+
+    Attributes:
+        path (str): The file the profile was loaded from, if any
+    """
+
+    __slots__ = ('name', 'rules', 'path')
+
+    def __init__(self, name, rules, path=None):
+        self.name = name
+        self.rules = rules
+        self.path = path
+
+    def __repr__(self):
+        return 'Profile({!r})'.format(self.name)
+
+    def range(self, decision, position, action):
+        """Returns the range of hands that take an action, weighted by how often they take it"""
+        table = self.rules[decision_index[decision], position_index[position]]
+        class_weights = np.where(table['action'] == action, table['probability'], 0.0)
+        class_weights += np.where((table['alternative'] == action) & (table['action'] != action),
+                                  1 - table['probability'], 0.0)
+        return Range.from_classes(class_weights)
+
+    def save(self, path):
+        """Writes the profile as a range file that parse_profile reads back into the same rules"""
+        with open(path, 'w') as file:
+            file.write(format_profile(self.rules, self.name))
+
+
+def parse_profile(text):
+    """Compiles the text of a range file into rule tables
+
+    Args:
+        text (str): The profile in the range file format described at the top of this module
+
+    Returns:
+        A structured array of rule_dtype indexed by decision, position and class (4 x 5 x 169)
+    """
+    # Weight of each action for every decision, position and class, before mixed actions are resolved
+    weights = collections.defaultdict(lambda: np.zeros(169))
+    decision = None
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.split('#')[0].strip()
+        if not line:
+            continue
+        if line.startswith('['):
+            decision = line.strip('[]').strip()
+            if decision not in decision_index:
+                raise ValueError('Unknown decision on line {}: {}'.format(line_number, decision))
+            continue
+        heading, separator, notation = line.partition(':')
+        try:
+            seats, action = heading.split()
+            action = int(action)
+        except ValueError:
+            raise ValueError('Expected "<positions> <action>: <range>" on line {}'.format(line_number))
+        if decision is None or not separator:
+            raise ValueError('Expected "<positions> <action>: <range>" on line {}'.format(line_number))
+        class_weights = Range(notation).class_weights()
+        for position in positions if seats == '*' else seats.split('/'):
+            if position not in position_index:
+                raise ValueError('Unknown position on line {}: {}'.format(line_number, position))
+            key = (decision_index[decision], position_index[position], action)
+            weights[key] = np.maximum(weights[key], class_weights)
+
+    rules = np.zeros((len(decisions), len(positions), 169), dtype=rule_dtype)
+    rules['probability'] = 1
+    for decision in range(len(decisions)):
+        for position in range(len(positions)):
+            actions = sorted((action for row, column, action in weights if (row, column) == (decision, position)),
+                             reverse=True)
+            for index in range(169):
+                listed = [(action, weights[decision, position, action][index]) for action in actions
+                          if weights[decision, position, action][index] > 0]
+                if not listed:
+                    continue
+                action, probability = listed[0]
+                if probability >= 1:
+                    rules[decision, position, index] = (action, action, 1)
+                else:
+                    alternative = listed[1][0] if len(listed) > 1 else 0
+                    rules[decision, position, index] = (action, alternative, probability)
+    return rules
+
+
+def _notation(class_indices):
+    """Writes a set of classes in short range notation, e.g. [AA, KK, QQ, AKs, AQs] as 'QQ+, AQs+'"""
+    class_indices = set(class_indices)
+    tokens = []
+
+    def runs(values):
+        values = sorted(values, reverse=True)
+        start = 0
+        for end in range(1, len(values) + 1):
+            if end == len(values) or values[end] != values[end - 1] - 1:
+                yield values[start], values[end - 1]
+                start = end
+
+    pairs = [rank for rank in range(13) if 13 * rank + rank in class_indices]
+    for top, bottom in runs(pairs):
+        if top == 12 and top != bottom:
+            tokens.append(ranks[bottom] * 2 + '+')
+        elif top == bottom:
+            tokens.append(ranks[top] * 2)
+        else:
+            tokens.append(ranks[top] * 2 + '-' + ranks[bottom] * 2)
+    for high in range(12, 0, -1):
+        for kind in ['s', 'o']:
+            kickers = [low for low in range(high) if (13 * high + low if kind == 's' else 13 * low + high)
+                       in class_indices]
+            for top, bottom in runs(kickers):
+                if top == high - 1 and top != bottom:
+                    tokens.append(ranks[high] + ranks[bottom] + kind + '+')
+                elif top == bottom:
+                    tokens.append(ranks[high] + ranks[top] + kind)
+                else:
+                    tokens.append(ranks[high] + ranks[top] + kind + '-' + ranks[high] + ranks[bottom] + kind)
+    return ', '.join(tokens)
+
+
+def format_profile(rules, name=None):
+    """Writes rule tables in the range file format, grouping positions that share the same range"""
+    lines = ['# Strategy profile {}'.format(name)] if name else []
+    for decision, decision_name in enumerate(decisions):
+        lines.append('[{}]'.format(decision_name))
+        # Tokens for each action, weight and position
+        entries = collections.OrderedDict()
+        for position in range(len(positions)):
+            table = rules[decision, position]
+            for action in sorted(set(table['action'].tolist()) | set(table['alternative'].tolist()), reverse=True):
+                if action == 0:
+                    continue
+                exact = table['action'] == action
+                mixed = exact & (table['probability'] < 1)
+                below = (table['alternative'] == action) & ~exact
+                groups = collections.defaultdict(list)
+                for index in np.flatnonzero(exact | below).tolist():
+                    groups[float(table['probability'][index]) if mixed[index] else 1.0].append(index)
+                for weight in sorted(groups, reverse=True):
+                    notation = _notation(groups[weight])
+                    if weight < 1:
+                        notation = ', '.join(token + ':{:g}'.format(weight) for token in notation.split(', '))
+                    entries.setdefault((action, notation), []).append(positions[position])
+        for (action, notation), seats in entries.items():
+            seats = '*' if len(seats) == len(positions) else '/'.join(seats)
+            lines.append('{} {}: {}'.format(seats, action, notation))
+    return '\n'.join(lines) + '\n'
+
+
+def load_profile(name):
+    """Loads a strategy profile, compiling its range file only when the binary cache is missing or out of date
+
+    Profiles are shared, so every Preflop or Action that uses the same file in a process reads the same tables,
+    and worker processes map the same cached file into memory.
+
+    Args:
+        name (str): The name of a profile in the Strategies directory, e.g. 'default', or the path of a range file
+
+    Returns:
+        A Profile
+    """
+    path = name if os.sep in name or name.endswith('.txt') else os.path.join(strategy_data, name + '.txt')
+    with open(path, 'rb') as file:
+        text = file.read()
+    digest = hashlib.sha1(text).hexdigest()
+    key = (os.path.abspath(path), digest)
+    if key in profiles:
+        return profiles[key]
+    profile_name = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(strategy_cache, '{}.{}.npy'.format(profile_name, digest[:16]))
+    try:
+        rules = np.load(cache_path, mmap_mode='r')
+    except (OSError, ValueError):
+        rules = parse_profile(text.decode())
+        os.makedirs(strategy_cache, exist_ok=True)
+        # Written under a temporary name so that workers starting together never read a partial file
+        partial_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        with open(partial_path, 'wb') as file:
+            np.save(file, rules)
+        os.replace(partial_path, cache_path)
+    profiles[key] = Profile(profile_name, rules, path)
+    return profiles[key]
+
+
+def builtin_profile():
+    """Returns the rules built into Preflop as a profile"""
+    return Profile('builtin', rule_table())
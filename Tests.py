@@ -0,0 +1,329 @@
+from Setup import *
+from Pot import *
+from Preflop import position_index
+from Postflop import Postflop
+from Range import Range
+from Cache import canonical_key, LRUCache
+from Strategy import parse_profile, format_profile, builtin_profile, Profile
+from Game import Game
+from Events import PlayerAction, HandHistoryWriter, read_hand_histories
+from History import HistoryWriter, read_hands
+from Replay import replay
+import io
+import os
+import tempfile
+import unittest
+
+# Deterministic checks of the evaluators, caches, ranges, profiles, history files, replays and chip accounting
+# Run with python -m unittest Tests
+
+
+def reference_five(cards):
+    """Scores five cards the slow way, as a (category, ranks) tuple that sorts in the order of hand strength"""
+    values = sorted((card >> 2 for card in cards), reverse=True)
+    counts = collections.Counter(values)
+    groups = sorted(counts.items(), key=lambda group: (group[1], group[0]), reverse=True)
+    shape = [count for rank, count in groups]
+    ordered = tuple(rank for rank, count in groups)
+    flush = len(set(card & 3 for card in cards)) == 1
+    straight = None
+    if len(counts) == 5:
+        if values[0] - values[4] == 4:
+            straight = values[0]
+        elif values == [12, 3, 2, 1, 0]:
+            straight = 3
+    if straight is not None and flush:
+        return 8, (straight,)
+    if shape == [4, 1]:
+        return 7, ordered
+    if shape == [3, 2]:
+        return 6, ordered
+    if flush:
+        return 5, tuple(values)
+    if straight is not None:
+        return 4, (straight,)
+    if shape == [3, 1, 1]:
+        return 3, ordered
+    if shape == [2, 2, 1]:
+        return 2, ordered
+    if shape == [2, 1, 1, 1]:
+        return 1, ordered
+    return 0, tuple(values)
+
+
+def reference(cards):
+    """Scores the best five of 5 to 7 cards by trying every five"""
+    return max(reference_five(five) for five in itertools.combinations(cards, 5))
+
+
+def random_hands(seed, count=2000):
+    """Deals a fixed list of 5, 6 and 7 card hands"""
+    rng = random.Random(seed)
+    return [rng.sample(range(52), rng.choice([5, 6, 7])) for _ in range(count)]
+
+
+class EvaluatorTest(unittest.TestCase):
+
+    def assert_same_order(self, hands, strengths):
+        """Checks that the strengths rank the hands exactly as the reference does, ties included"""
+        scores = [reference(hand) for hand in hands]
+        for hand, strength, score in zip(hands, strengths, scores):
+            self.assertEqual(hand_category(strength), score[0], to_strs(hand))
+        order = sorted(range(len(hands)), key=scores.__getitem__)
+        for lower, higher in zip(order, order[1:]):
+            if scores[lower] == scores[higher]:
+                self.assertEqual(strengths[lower], strengths[higher], (to_strs(hands[lower]), to_strs(hands[higher])))
+            else:
+                self.assertLess(strengths[lower], strengths[higher], (to_strs(hands[lower]), to_strs(hands[higher])))
+
+    def test_evaluate(self):
+        hands = random_hands(1)
+        self.assert_same_order(hands, [evaluate(hand) for hand in hands])
+
+    def test_evaluate_batch(self):
+        for size in (5, 6, 7):
+            rng = np.random.default_rng(size)
+            cards = np.array([rng.choice(52, size, replace=False) for _ in range(1000)])
+            strengths, categories = evaluate_batch(cards)
+            hands = cards.tolist()
+            self.assertEqual(strengths.tolist(), [evaluate(hand) for hand in hands])
+            self.assertEqual(categories.tolist(), [hand_category(strength) for strength in strengths.tolist()])
+            self.assert_same_order(hands, strengths.tolist())
+
+    def test_known_hands(self):
+        self.assertEqual(evaluate(to_ints(['Ah', 'Kh', 'Qh', 'Jh', 'Th'])), 7462)
+        self.assertEqual(evaluate(to_ints(['7h', '5d', '4s', '3c', '2h'])), 1)
+        # The wheel is the lowest straight
+        wheel = evaluate(to_ints(['Ah', '2d', '3s', '4c', '5h']))
+        self.assertLess(wheel, evaluate(to_ints(['2h', '3d', '4s', '5c', '6h'])))
+        self.assertEqual(hand_category(wheel), hand_categories.index('Straight'))
+
+
+class PostflopTest(unittest.TestCase):
+
+    def test_analyzer_keeps_the_flop_scenario(self):
+        hands = [to_ints(['8h', '9h', 'Th', '2c', 'Kd', 'Jc', '3s'])] + random_hands(2, 300)
+        for cards in (hand for hand in hands if len(hand) == 7):
+            flop = Postflop(cards[:5]).flop_scenario()
+            postflop = Postflop(cards[:5])
+            self.assertEqual(postflop.flop_scenario(), flop)
+            postflop.deal(cards[5])
+            self.assertEqual(postflop.analyzer.flop_scenario, flop, to_strs(cards))
+            postflop.good_turn()
+            postflop.deal(cards[6])
+            self.assertEqual(postflop.analyzer.flop_scenario, flop, to_strs(cards))
+            self.assertEqual(postflop.analyzer.strength, evaluate(cards))
+            # Built after the turn, from a turn whose scenario was already cached
+            late = Postflop(cards[:6])
+            late.good_turn()
+            late.deal(cards[6])
+            self.assertEqual(late.analyzer.flop_scenario, flop, to_strs(cards))
+
+
+class CacheTest(unittest.TestCase):
+
+    def test_canonical_key(self):
+        key = canonical_key(to_ints(['Ah', 'Kh']), to_ints(['Qh', '7h', '2c']))
+        self.assertEqual(canonical_key(to_ints(['As', 'Ks']), to_ints(['Qs', '7s', '2d'])), key)
+        self.assertEqual(canonical_key(to_ints(['Kh', 'Ah']), to_ints(['2c', 'Qh', '7h'])), key)
+        # A flush draw and a backdoor flush draw are different spots
+        self.assertNotEqual(canonical_key(to_ints(['Ah', 'Kh']), to_ints(['Qh', '7c', '2c'])), key)
+        # The turn is kept apart from the flop
+        self.assertNotEqual(canonical_key(to_ints(['Ah', 'Kd']), to_ints(['Qh', '7h', '2c', '3s'])),
+                            canonical_key(to_ints(['Ah', 'Kd']), to_ints(['Qh', '7h', '3s', '2c'])))
+        rng = random.Random(3)
+        for cards in random_hands(3, 300):
+            suits = list(range(4))
+            rng.shuffle(suits)
+            renamed = [card & ~3 | suits[card & 3] for card in cards]
+            self.assertEqual(canonical_key(renamed[:2], renamed[2:]), canonical_key(cards[:2], cards[2:]),
+                             to_strs(cards))
+
+    def test_lru_cache(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        # b is now the least recently used entry
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats(), {'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 1, 'evictions': 1})
+
+
+class RangeTest(unittest.TestCase):
+
+    def test_notation(self):
+        self.assertEqual(Range('AA').num_combos(), 6)
+        self.assertEqual(Range('AKs').num_combos(), 4)
+        self.assertEqual(Range('AKo').num_combos(), 12)
+        self.assertEqual(Range('77+').num_combos(), 8 * 6)
+        self.assertEqual(Range('A2s-A5s').num_combos(), 4 * 4)
+        self.assertEqual(Range('ATs+').num_combos(), Range('AKs, AQs, AJs, ATs').num_combos())
+        self.assertEqual(Range('AhKh').num_combos(), 1)
+        self.assertEqual(Range('AKo:0.5').num_combos(), 6)
+        self.assertIn(['Ah', 'Kh'], Range('AKs'))
+        self.assertNotIn(['Ah', 'Kd'], Range('AKs'))
+        self.assertEqual(Range('AKo:0.5, AhKd').weight(['Kd', 'Ah']), 1)
+        with self.assertRaises(ValueError):
+            Range('AK+s')
+
+    def test_set_operations(self):
+        self.assertEqual((Range('QQ+') | Range('JJ')).num_combos(), 24)
+        self.assertEqual((Range('TT+') & Range('77-JJ')).num_combos(), 12)
+        self.assertEqual((Range('22+') - Range('QQ+')).num_combos(), 13 * 6 - 18)
+        self.assertEqual((Range('AKs') - Range('AKs:0.25')).weight(['As', 'Ks']), 0.75)
+        # Removing a card drops every combination that holds it
+        self.assertEqual(Range('AA, AKs').remove(['Ah']).num_combos(), 3 + 3)
+        self.assertEqual(Range.full().num_combos(), 1326)
+
+
+class StrategyTest(unittest.TestCase):
+
+    profile = """
+        # Comments and blank lines are skipped
+        [open]
+        early/small 1: 77+, AKo, ATs+, A5s:0.25
+        * 1: QQ+
+        [raise]
+        * 3: KK+
+        * 2: QQ, AKs:0.5
+        """
+
+    def test_parse_profile(self):
+        rules = parse_profile(self.profile)
+        aces, sevens, a5s = hand_class(48, 49), hand_class(20, 21), hand_class(48, 12)
+        self.assertEqual(rules[0, position_index['early'], sevens].tolist(), (1, 1, 1))
+        self.assertEqual(rules[0, position_index['late'], sevens].tolist(), (0, 0, 1))
+        self.assertEqual(rules[0, position_index['late'], aces].tolist(), (1, 1, 1))
+        self.assertEqual(rules[0, position_index['small'], a5s].tolist(), (1, 0, 0.25))
+        # A mixed action falls back on the next lower action listed for the hand
+        self.assertEqual(rules[1, position_index['big'], hand_class(48, 44)].tolist(), (2, 0, 0.5))
+        self.assertEqual(rules[1, position_index['big'], aces].tolist(), (3, 3, 1))
+        for text in ('[call]\n* 1: AA', '* 1: AA', '[open]\nbutton 1: AA', '[open]\nearly: AA'):
+            with self.assertRaises(ValueError):
+                parse_profile(text)
+
+    def test_round_trip(self):
+        for rules in (parse_profile(self.profile), builtin_profile().rules):
+            text = format_profile(rules, 'test')
+            self.assertEqual(parse_profile(text).tolist(), rules.tolist(), text)
+        profile = Profile('test', parse_profile(self.profile))
+        self.assertEqual(profile.range('open', 'small', 1).num_combos(),
+                         Range('77+, AKo, ATs+, A5s:0.25').num_combos())
+
+
+def play_hands(path, num_hands, agents=None, seed=0):
+    """Plays hands with short, uneven stacks so that some of them go all in, writing them to a history file
+
+    Returns:
+        The hands as lists of events, as written by a HandHistoryWriter
+    """
+    rng = random.Random(seed)
+    random.seed(seed)
+    text = io.StringIO()
+    with HistoryWriter(path) as writer:
+        game = Game(6, 0.05, 0.10, [10] * 6, agents=agents, output=None, seed=seed,
+                    subscribers=[writer, HandHistoryWriter(text)])
+        for _ in range(num_hands):
+            game.stacks = [rng.randint(10, 500) / 100 for _ in range(6)]
+            game.play_hand()
+    text.seek(0)
+    return list(read_hand_histories(text))
+
+
+class HistoryTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hands.hh')
+            hands = play_hands(path, 300)
+            self.assertEqual(list(read_hands(path, chunk_size=100)), hands)
+
+
+
+class PairAgent:
+    """Raises with a pair, folds two low cards to a bet and calls anything else, the same way every time"""
+
+    def act(self, game, position):
+        card1, card2 = game.temp_card_holder[position]
+        if card1 >> 2 == card2 >> 2:
+            return "Raise 0.5"
+        if max(card1, card2) >> 2 < 6 and max(game.chips.bets) > game.chips.bets[position - 1]:
+            return "Fold"
+        return "Call"
+
+
+class ReplayTest(unittest.TestCase):
+
+    def test_same_agent_changes_nothing(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hands.hh')
+            hands = play_hands(path, 200, agents=[PairAgent()] * 6)
+            result = replay([path], PairAgent(), processes=1)
+        actions = sum(type(event) is PlayerAction for hand in hands for event in hand)
+        self.assertEqual((result.decisions, result.changed, result.resized), (actions, 0, 0))
+        self.assertFalse(result.diffs)
+
+    def test_bot_agent(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hands.hh')
+            hands = play_hands(path, 200)
+            first = replay([path], processes=1, seed=1)
+            second = replay([path], processes=1, seed=1)
+        actions = sum(type(event) is PlayerAction for hand in hands for event in hand)
+        self.assertEqual(first.decisions, actions)
+        self.assertLessEqual(first.changed + first.resized, first.decisions)
+        self.assertEqual(sum(first.diffs.values()), first.changed)
+        # The same seed mixes actions the same way
+        self.assertEqual(first[:4], second[:4])
+
+
+class PotTest(unittest.TestCase):
+
+    def test_side_pots(self):
+        # Seat 1 is all in short, seats 2 and 3 carry on into a side pot
+        self.assertEqual(side_pots([100, 300, 300], [True, True, True]), [(300, [1, 2, 3]), (400, [2, 3])])
+        # Seat 3 folded after putting in 200: 100 of it goes to the main pot and 100 to the side pot
+        self.assertEqual(side_pots([100, 300, 200], [True, True, False]), [(300, [1, 2]), (300, [2])])
+        # Two short all ins at different levels
+        self.assertEqual(side_pots([50, 150, 400, 400], [True, True, True, True]),
+                         [(200, [1, 2, 3, 4]), (300, [2, 3, 4]), (500, [3, 4])])
+        # Chips from a folded seat above the last caller go to the last pot
+        self.assertEqual(side_pots([200, 500, 200], [True, False, True]), [(900, [1, 3])])
+
+    def test_award_pots(self):
+        # A split pot with an odd unit pays the earlier seat first
+        self.assertEqual(award_pots([(301, [1, 2, 3])], {1: 10, 2: 50, 3: 50}), {2: 151, 3: 150})
+        self.assertEqual(award_pots([(100, [1, 2, 3])], {1: 7, 2: 7, 3: 7}), {1: 34, 2: 33, 3: 33})
+        # The short stack wins the main pot, the side pot goes to the best of the rest
+        self.assertEqual(award_pots([(300, [1, 2, 3]), (400, [2, 3])], {1: 900, 2: 100, 3: 200}), {1: 300, 3: 400})
+        # A pot with one eligible player needs no strengths
+        self.assertEqual(award_pots([(500, [2])], {}), {2: 500})
+
+    def test_collect(self):
+        chips = Pot([1000, 1000, 1000])
+        chips.bet(1, 200)
+        chips.bet(2, 500)
+        chips.bet(3, 200)
+        self.assertEqual(chips.collect(), 2)
+        self.assertEqual(chips.stacks, [800, 800, 800])
+        self.assertEqual(chips.total(), 600)
+
+    def test_chips_are_conserved(self):
+        for seed in range(4):
+            rng = random.Random(seed)
+            random.seed(seed)
+            num_players = 2 + seed * 2
+            game = Game(num_players, 0.05, 0.10, [10] * num_players, output=None, seed=seed)
+            for _ in range(250):
+                game.stacks = [rng.randint(1, 1000) / 100 for _ in range(num_players)]
+                before = [to_units(stack) for stack in game.stacks]
+                results = [to_units(result) for result in game.play_hand()]
+                self.assertEqual(sum(results), 0)
+                self.assertEqual(sum(game.chips.stacks), sum(before))
+                self.assertEqual([stack + result for stack, result in zip(before, results)], game.chips.stacks)
+                self.assertTrue(all(stack >= 0 for stack in game.chips.stacks))
+
+
+if __name__ == '__main__':
+    unittest.main()